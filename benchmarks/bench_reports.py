@@ -0,0 +1,100 @@
+"""Render-time and size benchmarks for the HTML report tables on synthetic rows.
+
+Run from the repository root:  python benchmarks/bench_reports.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ranking  # noqa: E402
+import report_tables  # noqa: E402
+
+ROW_TEMPLATE = """
+                <tr style="background-color: {row_color};">
+                    <td style="padding: 8px; text-align: center; font-weight: bold; color: #d32f2f;">#{rank}</td>
+                    <td style="padding: 8px; font-family: monospace; font-weight: bold;">{snapshot_id}</td>
+                    <td style="padding: 8px; font-weight: bold;">{ccid}</td>
+                    <td style="padding: 8px;">{current_cenvid}</td>
+                    <td style="padding: 8px; font-weight: bold;">{issue}</td>
+                    <td style="padding: 8px; font-weight: bold; color: #d32f2f;">{cost_since_created}</td>
+                </tr>
+        """
+HEAD = '<table><tbody>'
+TAIL = '</tbody></table>'
+
+
+def make_rows(row_count: int, seed: int = 0) -> pd.DataFrame:
+    """Synthetic non-compliant rows, already ranked by cost"""
+    rng = np.random.default_rng(seed)
+    costs = np.sort(rng.uniform(0, 500, row_count).round(2))[::-1]
+    return pd.DataFrame({
+        'rank': np.arange(1, row_count + 1),
+        'row_color': rng.choice(['#ffcdd2', '#ffe0b2'], row_count),
+        'snapshot_id': [f"snap-{i:08d}" for i in range(row_count)],
+        'ccid': rng.choice(['CCID001', 'CCID002', 'CCID003'], row_count),
+        'current_cenvid': rng.choice(['None', 'CENV-PROD', 'CENV-DEV'], row_count),
+        'issue': rng.choice(['Missing CENVID', 'Invalid CENVID'], row_count),
+        'cost_since_created': costs,
+    })
+
+
+def render_concatenated(rows: pd.DataFrame) -> str:
+    """The previous approach: iterrows plus string += per row"""
+    html = HEAD
+    for _, row in rows.iterrows():
+        html += ROW_TEMPLATE.format(**row)
+    return html + TAIL
+
+
+def best_of(func, repeat: int = 3):
+    """Best wall-clock time in seconds over a few runs, plus the last result"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def bench_render_table(row_count: int = 100_000, limit: int = report_tables.DEFAULT_EMAIL_ROW_LIMIT):
+    rows = make_rows(row_count)
+
+    def render(row_limit):
+        shown, remaining_count, remaining_total = ranking.top_k_split(rows, 'cost_since_created', row_limit)
+        return report_tables.render_table(HEAD, ROW_TEMPLATE, shown, TAIL, remaining_count, remaining_total, colspan=6)
+
+    concatenated, concatenated_html = best_of(lambda: render_concatenated(rows), repeat=1)
+    joined, joined_html = best_of(lambda: render(None))
+    top, top_html = best_of(lambda: render(limit))
+    print(f"iterrows + '+=': {row_count} rows in {concatenated:.2f}s ({len(concatenated_html) / 1e6:.1f}MB)")
+    print(f"render_table (all rows): {row_count} rows in {joined:.2f}s ({len(joined_html) / 1e6:.1f}MB)")
+    print(f"render_table (top {limit} + remaining row): {top * 1000:.1f}ms ({len(top_html) / 1e3:.0f}KB)")
+
+
+def bench_top_k(row_count: int = 1_000_000, k: int = report_tables.DEFAULT_EMAIL_ROW_LIMIT, chunksize: int = 100_000):
+    rng = np.random.default_rng(1)
+    rows = pd.DataFrame({'cost': rng.uniform(0, 500, row_count).round(2), 'id': np.arange(row_count)})
+
+    full_sort, _ = best_of(lambda: rows.sort_values('cost', ascending=False).head(k))
+    partial, _ = best_of(lambda: ranking.top_k(rows, 'cost', k))
+
+    def streamed():
+        top = ranking.StreamingTopK('cost', k)
+        for start in range(0, row_count, chunksize):
+            top.update(rows.iloc[start:start + chunksize])
+        return top.result()
+
+    streaming, _ = best_of(streamed)
+    print(f"sort_values + head: top {k} of {row_count} rows in {full_sort * 1000:.0f}ms")
+    print(f"ranking.top_k (argpartition): top {k} of {row_count} rows in {partial * 1000:.0f}ms")
+    print(f"ranking.StreamingTopK: top {k} over {row_count // chunksize} chunks in {streaming * 1000:.0f}ms")
+
+
+if __name__ == '__main__':
+    bench_render_table()
+    bench_top_k()
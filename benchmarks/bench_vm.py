@@ -0,0 +1,188 @@
+"""Timing benchmarks for the VM right-sizing engine on synthetic fleets.
+
+Run from the repository root:  python benchmarks/bench_vm.py
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import catalog_cache  # noqa: E402
+import usage_metrics  # noqa: E402
+import vm  # noqa: E402
+
+FAMILIES = ['B', 'D', 'E', 'F', 'M']
+PLATFORMS = ['Linux', 'Ubuntu', 'Windows Server 2019', 'RHEL', 'Other']
+
+
+def make_catalog(sku_count: int, seed: int = 0) -> pd.DataFrame:
+    """Synthetic pricing catalog shaped like load_azure_pricing_data output"""
+    rng = np.random.default_rng(seed)
+    cores = rng.choice([2, 4, 8, 16, 32, 64, 128], sku_count)
+    memory = cores * rng.choice([2, 4, 8], sku_count)
+    return pd.DataFrame({
+        'name': [f"Standard_{rng.choice(FAMILIES)}{c}s_v{i}" for i, c in enumerate(cores)],
+        'numberOfCores': cores,
+        'memoryInGB': memory.astype(float),
+        'linuxPrice': np.round(cores * 20 + memory * 2 + rng.normal(0, 5, sku_count), 2),
+        'windowsPrice': np.round(cores * 40 + memory * 3 + rng.normal(0, 5, sku_count), 2),
+        'cpuArchitecture': rng.choice(['x64', 'Arm64'], sku_count, p=[0.8, 0.2]),
+    })
+
+
+def make_fleet(vm_count: int, azure_df: pd.DataFrame, seed: int = 1) -> pd.DataFrame:
+    """Synthetic VM export with the columns process_vm_data reads"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'o9 CCID': rng.choice(['CCID001', 'CCID002', 'CCID003'], vm_count),
+        'Server Type': rng.choice(['App', 'DB', 'Web'], vm_count),
+        'Instance Name or ID': [f"vm-{i}" for i in range(vm_count)],
+        'Instance Type': rng.choice(azure_df['name'].to_numpy(), vm_count),
+        'Platform': rng.choice(PLATFORMS, vm_count),
+        'Max CPU (%)': rng.uniform(0, 100, vm_count).round(1),
+        'Max Memory (%)': rng.uniform(0, 100, vm_count).round(1),
+        'CPU Count': rng.choice([2, 4, 8, 16, 32, 64], vm_count),
+        'Total Memory': rng.choice([4.0, 8, 16, 32, 64, 128, 256], vm_count),
+    })
+
+
+def best_of(func, repeat: int = 3) -> float:
+    """Best wall-clock time in seconds over a few runs"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_process_vm_data(vm_count: int = 50_000, sku_count: int = 500):
+    azure_df = make_catalog(sku_count)
+    fleet = make_fleet(vm_count, azure_df)
+    seconds = best_of(lambda: vm.process_vm_data(fleet, azure_df))
+    print(f"process_vm_data: {vm_count} VMs x {sku_count} SKUs in {seconds:.3f}s")
+
+
+def bench_analyze_vm_data(vm_count: int = 50_000, sku_count: int = 500):
+    azure_df = make_catalog(sku_count)
+    fleet = make_fleet(vm_count, azure_df)
+    pricing = vm.PricingLookup(azure_df)
+    separate = best_of(lambda: (
+        vm.create_analysis_table(fleet, azure_df, pricing),
+        vm.process_vm_data(fleet, azure_df, pricing),
+    ))
+    fused = best_of(lambda: vm.analyze_vm_data(fleet, azure_df, pricing))
+    print(f"create_analysis_table + process_vm_data: {vm_count} VMs in {separate:.3f}s")
+    print(f"analyze_vm_data (single pass): {vm_count} VMs in {fused:.3f}s")
+
+
+def bench_analyze_fleet(vm_count: int = 50_000, ccid_count: int = 100, sku_count: int = 500):
+    azure_df = make_catalog(sku_count)
+    fleet = make_fleet(vm_count, azure_df)
+    rng = np.random.default_rng(3)
+    fleet['o9 CCID'] = rng.choice([f"CCID{i:03d}" for i in range(ccid_count)], vm_count)
+    pricing = vm.PricingLookup(azure_df)
+    
+    def per_slice():
+        for (ccid, server_type), rows in fleet.groupby(vm.FLEET_SLICE_COLUMNS, sort=False, observed=True):
+            vm.analyze_vm_data(rows, azure_df, pricing)
+    
+    slices = fleet.groupby(vm.FLEET_SLICE_COLUMNS).ngroups
+    looped = best_of(per_slice, repeat=1)
+    batched = best_of(lambda: vm.analyze_fleet(fleet, azure_df, pricing))
+    print(f"analyze_vm_data per slice: {slices} slices of {vm_count} VMs in {looped:.3f}s")
+    print(f"analyze_fleet (one pass + groupby): {slices} slices of {vm_count} VMs in {batched:.3f}s")
+
+
+def bench_price_frontier(sku_count: int = 5_000, lookups: int = 2_000):
+    azure_df = make_catalog(sku_count)
+    rng = np.random.default_rng(2)
+    cpu_reqs = rng.choice(vm.get_standard_cpu_sizes(), lookups)
+    memory_reqs = rng.choice(vm.get_standard_memory_sizes(), lookups)
+    
+    start = time.perf_counter()
+    index = vm.PriceFrontierIndex(azure_df, 'x64', 'linuxPrice')
+    build_seconds = time.perf_counter() - start
+    print(f"PriceFrontierIndex build: {sku_count} SKUs -> {len(index.frontier_positions)} on the frontier in {build_seconds * 1000:.1f}ms")
+    
+    scan_lookups = lookups // 20
+    scan = best_of(lambda: [
+        vm.find_cost_effective_instance(c, m, 'Linux', 'x64', None, azure_df)
+        for c, m in zip(cpu_reqs[:scan_lookups], memory_reqs[:scan_lookups])
+    ], repeat=1)
+    single = best_of(lambda: [index.cheapest(c, m) for c, m in zip(cpu_reqs, memory_reqs)])
+    batch = best_of(lambda: index.cheapest_many(cpu_reqs, memory_reqs))
+    print(f"find_cost_effective_instance: {scan / scan_lookups * 1e6:.1f}us per lookup")
+    print(f"PriceFrontierIndex.cheapest: {single / lookups * 1e6:.1f}us per lookup")
+    print(f"PriceFrontierIndex.cheapest_many: {batch / lookups * 1e6:.2f}us per lookup")
+
+
+def bench_catalog_loader(sku_count: int = 10_000):
+    catalog = make_catalog(sku_count)
+    records = [{
+        'name': row.name,
+        'numberOfCores': int(row.numberOfCores),
+        'memoryInMB': int(row.memoryInGB * 1024),
+        'memoryInGB': float(row.memoryInGB),
+        'linuxPrice': f"${row.linuxPrice:,.2f}",
+        'windowsPrice': float(row.windowsPrice),
+        'architecture': row.cpuArchitecture,
+    } for row in catalog.itertuples()]
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'azure-data.json')
+        with open(path, 'w') as file:
+            json.dump(records, file)
+        
+        catalog_cache.clear_catalog_cache()
+        start = time.perf_counter()
+        vm.load_azure_pricing_catalog(path)
+        compile_seconds = time.perf_counter() - start
+        
+        # A fresh process: nothing in memory, compiled .npz on disk
+        catalog_cache.clear_catalog_cache()
+        start = time.perf_counter()
+        vm.load_azure_pricing_catalog(path)
+        compiled_seconds = time.perf_counter() - start
+        
+        rerun = best_of(lambda: vm.load_azure_pricing_catalog(path), repeat=100)
+        catalog_cache.clear_catalog_cache()
+    
+    print(f"catalog cold start (JSON parse + compile): {sku_count} SKUs in {compile_seconds * 1000:.1f}ms")
+    print(f"catalog cold start (compiled .npz): {sku_count} SKUs in {compiled_seconds * 1000:.1f}ms")
+    print(f"catalog rerun (in-process cache): {rerun * 1e6:.1f}us")
+
+
+def bench_utilization_sketch(sample_count: int = 10_000_000, vm_count: int = 5_000, chunksize: int = 1_000_000):
+    rng = np.random.default_rng(4)
+    names = np.array([f"vm-{i}" for i in range(vm_count)], dtype=object)
+    chunks = [(
+        pd.Series(names[rng.integers(0, vm_count, chunksize)]),
+        pd.Series(rng.uniform(0, 100, chunksize).round(1)),
+        pd.Series(rng.uniform(0, 100, chunksize).round(1)),
+    ) for _ in range(2)]
+    
+    sketch = usage_metrics.UtilizationSketch()
+    start = time.perf_counter()
+    for i in range(sample_count // chunksize):
+        sketch.update(*chunks[i % len(chunks)])
+    update_seconds = time.perf_counter() - start
+    quantile_seconds = best_of(lambda: sketch.quantiles([95, 99]))
+    memory_mb = sketch.nbytes / 1e6
+    print(f"UtilizationSketch: {sample_count} samples for {vm_count} VMs in {update_seconds:.2f}s "
+          f"({memory_mb:.0f}MB of histograms); p95/p99 in {quantile_seconds * 1000:.0f}ms")
+
+
+if __name__ == '__main__':
+    bench_process_vm_data()
+    bench_analyze_vm_data()
+    bench_analyze_fleet()
+    bench_price_frontier()
+    bench_catalog_loader()
+    bench_utilization_sketch()
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import threading
+import zipfile
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Bump when the compiled layout or the preparation of the source changes
+CATALOG_SCHEMA_VERSION = 1
+COMPILED_SUFFIX = '.catalog.npz'
+META_KEY = '__meta__'
+NULL_PREFIX = '__null__'
+
+
+class CompiledCatalog:
+    """A prepared pricing catalog plus values derived from it.
+
+    The frame is shared by every caller in the process, so treat it as
+    read-only; derived values (lookup indexes and the like) are built once per
+    catalog version through ``derive``.
+    """
+
+    def __init__(self, frame: pd.DataFrame, sha256: str):
+        self.frame = frame
+        self.sha256 = sha256
+        self._derived: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def derive(self, name: str, builder: Callable[[pd.DataFrame], Any]) -> Any:
+        """Return builder(frame), computed once for this catalog version"""
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = builder(self.frame)
+            return self._derived[name]
+
+
+# Process-wide cache: source path -> ((mtime_ns, size), catalog)
+_catalogs: Dict[str, Tuple[Tuple[int, int], CompiledCatalog]] = {}
+_catalogs_lock = threading.Lock()
+
+
+def clean_price_column(values: pd.Series) -> pd.Series:
+    """Parse prices like '$1,234.50' to float; blanks, 'N/A' and junk become NaN"""
+    text = values.astype(str).str.replace(r'[,$ ]', '', regex=True)
+    prices = pd.to_numeric(text, errors='coerce').astype(float)
+    return prices.where(values.notna())
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compiled_path_for(source_path: str) -> str:
+    """Location of the compiled catalog next to its JSON source"""
+    return os.path.splitext(source_path)[0] + COMPILED_SUFFIX
+
+
+def write_compiled_catalog(frame: pd.DataFrame, path: str, source_sha256: str):
+    """Store a frame as typed columns in an .npz file (no pickled objects)"""
+    arrays = {}
+    columns = []
+    for column in frame.columns:
+        values = frame[column]
+        key = f"c{len(columns)}"
+        if values.dtype.kind in 'biuf':
+            arrays[key] = values.to_numpy()
+        else:
+            nulls = values.isna().to_numpy()
+            arrays[key] = values.where(~nulls, '').astype(str).to_numpy(dtype=str)
+            arrays[NULL_PREFIX + key] = nulls
+        columns.append(str(column))
+
+    meta = {'schema': CATALOG_SCHEMA_VERSION, 'source_sha256': source_sha256, 'columns': columns}
+    arrays[META_KEY] = np.array(json.dumps(meta))
+
+    # Write to a temporary name first so readers never see a partial file
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def read_compiled_catalog(path: str, source_sha256: str) -> Optional[pd.DataFrame]:
+    """Load a compiled catalog, or None if it is missing, stale or unreadable
+    (including a truncated or corrupt archive), so the caller rebuilds it"""
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data[META_KEY]))
+            if meta.get('schema') != CATALOG_SCHEMA_VERSION or meta.get('source_sha256') != source_sha256:
+                return None
+
+            columns = {}
+            for i, column in enumerate(meta['columns']):
+                key = f"c{i}"
+                values = data[key]
+                if NULL_PREFIX + key in data.files:
+                    values = values.astype(object)
+                    values[data[NULL_PREFIX + key]] = None
+                columns[column] = values
+            return pd.DataFrame(columns)
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None
+
+
+def load_compiled_catalog(source_path: str,
+                          prepare: Callable[[list], pd.DataFrame]) -> CompiledCatalog:
+    """Load a JSON catalog through a compiled .npz copy and a process-wide cache.
+
+    ``prepare`` turns the parsed JSON records into the catalog frame and only
+    runs when the source content changes. Reruns with an unchanged file cost a
+    single ``os.stat``; a touched but identical file costs one hash. The
+    lock only guards the cache lookups, so a slow parse never blocks readers of
+    other catalogs. Raises OSError/ValueError if the source cannot be read or
+    parsed.
+    """
+    stat = os.stat(source_path)
+    stat_key = (stat.st_mtime_ns, stat.st_size)
+
+    with _catalogs_lock:
+        cached = _catalogs.get(source_path)
+    if cached is not None and cached[0] == stat_key:
+        return cached[1]
+
+    sha256 = file_sha256(source_path)
+    if cached is not None and cached[1].sha256 == sha256:
+        catalog = cached[1]
+    else:
+        compiled_path = compiled_path_for(source_path)
+        frame = read_compiled_catalog(compiled_path, sha256)
+        if frame is None:
+            with open(source_path, 'r') as file:
+                frame = prepare(json.load(file))
+            try:
+                write_compiled_catalog(frame, compiled_path, sha256)
+            except OSError:
+                pass  # Read-only location: keep the in-memory copy only
+        catalog = CompiledCatalog(frame, sha256)
+
+    with _catalogs_lock:
+        current = _catalogs.get(source_path)
+        # Another thread may have loaded the same content meanwhile; keep one shared catalog
+        if current is not None and current[1].sha256 == sha256:
+            catalog = current[1]
+        _catalogs[source_path] = (stat_key, catalog)
+    return catalog
+
+
+def clear_catalog_cache():
+    """Drop every in-memory catalog (compiled files on disk are kept)"""
+    with _catalogs_lock:
+        _catalogs.clear()
@@ -0,0 +1,222 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Iterator, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Keys of one customer entry in the tag compliance rules (Tags.json)
+CCID_KEY = "CCID (Unique Per Customer)"
+CENVID_KEYS = ["CENVID (PRE PROD)", "CENVID (PROD)", "CENVID (DEV)", "CENVID (STG)", "CENVID(PSR)"]
+
+
+def normalize_tag(value) -> str:
+    """Tag values are compared trimmed and uppercase"""
+    return str(value).upper().strip()
+
+
+class ComplianceIndex(Mapping):
+    """Valid CENVIDs per CCID plus the reverse CENVID -> CCID map.
+
+    Reads like the old ``{ccid: cenvids}`` dict (``ccid in index``,
+    ``index[ccid]``) but values are frozensets, so membership tests are O(1).
+    Every key is normalized with ``normalize_tag``. One instance per rules
+    file version is shared by every session, so treat it as read-only.
+    """
+
+    def __init__(self, cenvids_by_ccid: Dict[str, FrozenSet[str]]):
+        self.cenvids_by_ccid = cenvids_by_ccid
+        # A CENVID listed under several CCIDs maps to the first one in the file
+        self.ccid_by_cenvid: Dict[str, str] = {}
+        for ccid, cenvids in cenvids_by_ccid.items():
+            for cenvid in cenvids:
+                self.ccid_by_cenvid.setdefault(cenvid, ccid)
+
+    def __getitem__(self, ccid: str) -> FrozenSet[str]:
+        return self.cenvids_by_ccid[ccid]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.cenvids_by_ccid)
+
+    def __len__(self) -> int:
+        return len(self.cenvids_by_ccid)
+
+    def valid_cenvids(self, ccid: str) -> FrozenSet[str]:
+        """Valid CENVIDs of a CCID (empty if the CCID is unknown)"""
+        return self.cenvids_by_ccid.get(normalize_tag(ccid), frozenset())
+
+    def owner_of(self, cenvid: str) -> Optional[str]:
+        """CCID a CENVID is registered to, or None"""
+        return self.ccid_by_cenvid.get(normalize_tag(cenvid))
+
+    @classmethod
+    def from_records(cls, records: list) -> 'ComplianceIndex':
+        """Build the index from the parsed rules file (a list of customer entries)"""
+        cenvids_by_ccid: Dict[str, set] = {}
+        for entry in records:
+            ccid = normalize_tag(entry.get(CCID_KEY) or "")
+            if not ccid:
+                continue
+            cenvids = cenvids_by_ccid.setdefault(ccid, set())
+            for key in CENVID_KEYS:
+                cenvid = normalize_tag(entry.get(key) or "")
+                if cenvid:
+                    cenvids.add(cenvid)
+        return cls({ccid: frozenset(cenvids) for ccid, cenvids in cenvids_by_ccid.items()})
+
+
+EMPTY_INDEX = ComplianceIndex({})
+
+# Process-wide cache: rules path -> (mtime_ns, index)
+_indexes: Dict[str, Tuple[int, ComplianceIndex]] = {}
+_indexes_lock = threading.Lock()
+
+
+def load_compliance_index(path: str) -> ComplianceIndex:
+    """Compliance index for a rules file, rebuilt only when the file's mtime changes.
+
+    A missing or unreadable file gives an empty index, like the old loaders'
+    empty dict, so callers can keep testing ``if not index``.
+    """
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return EMPTY_INDEX
+
+    with _indexes_lock:
+        cached = _indexes.get(path)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+
+        try:
+            with open(path, 'r') as file:
+                index = ComplianceIndex.from_records(json.load(file))
+        except (OSError, ValueError, TypeError, AttributeError):
+            return EMPTY_INDEX
+
+        _indexes[path] = (mtime_ns, index)
+        return index
+
+
+def clear_compliance_cache():
+    """Drop every loaded index"""
+    with _indexes_lock:
+        _indexes.clear()
+
+
+# Per-resource outcome of the whole-upload compliance pass
+STATUS_COMPLIANT = 'Compliant'
+STATUS_MISSING = 'Missing CENVID'
+STATUS_UNKNOWN = 'Unknown CENVID'
+STATUS_OTHER_CCID = 'Belongs to Other CCID'
+COMPLIANCE_STATUSES = [STATUS_COMPLIANT, STATUS_MISSING, STATUS_UNKNOWN, STATUS_OTHER_CCID]
+
+# Normalized cell values that mean "no tag" (blank cells, or NaN/None already turned into text)
+MISSING_TAG_VALUES = frozenset(['', 'NAN', 'NONE'])
+
+
+def normalized_codes(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Factorize a tag column and normalize only its distinct values"""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return codes, np.array([normalize_tag(value) for value in uniques], dtype=object)
+
+
+def classify_cenvids(ccids: pd.Series, cenvids: pd.Series, index: ComplianceIndex) -> pd.DataFrame:
+    """Classify every resource's CENVID against the whole index in one pass.
+
+    Each row is Compliant (the CENVID is registered to the row's CCID), Missing,
+    Unknown (registered to no CCID) or Belongs to Other CCID. Only the distinct
+    values and distinct (CCID, CENVID) pairs are looked up, so millions of rows
+    cost a factorize plus a handful of dict probes. Returns 'Compliance Status'
+    (categorical) and 'Owner CCID' aligned with the input.
+    """
+    ccid_codes, ccid_values = normalized_codes(ccids)
+    cenvid_codes, cenvid_values = normalized_codes(cenvids)
+
+    missing = np.array([value in MISSING_TAG_VALUES for value in cenvid_values], dtype=bool)
+    owners = np.array([index.ccid_by_cenvid.get(value) for value in cenvid_values], dtype=object)
+
+    # Pair membership only needs checking for each distinct (CCID, CENVID) combination
+    width = max(len(cenvid_values), 1)
+    pair_codes, unique_pairs = pd.factorize(ccid_codes.astype(np.int64) * width + cenvid_codes)
+    pair_ccids = ccid_values[unique_pairs // width]
+    pair_cenvids = cenvid_values[unique_pairs % width]
+    pair_compliant = np.array([cenvid in index.cenvids_by_ccid.get(ccid, ())
+                               for ccid, cenvid in zip(pair_ccids, pair_cenvids)], dtype=bool)
+
+    unknown = np.array([owner is None for owner in owners], dtype=bool)
+    row_owners = owners[cenvid_codes]
+    status = np.select(
+        [pair_compliant[pair_codes], missing[cenvid_codes], unknown[cenvid_codes]],
+        [0, 1, 2],
+        default=3
+    )
+    return pd.DataFrame({
+        'Compliance Status': pd.Categorical.from_codes(status, COMPLIANCE_STATUSES),
+        'Owner CCID': row_owners,
+    }, index=ccids.index)
+
+
+MATRIX_COLUMNS = ['Total', 'Compliant', 'Non-Compliant', 'Missing CENVID', 'Invalid CENVID',
+                  'Compliance %', 'Cost Impact', 'In Rules']
+MATRIX_CACHE_ENTRIES = 16
+
+# Process-wide cache: (upload key, scope) -> (index, matrix); a reloaded index invalidates its entries
+_matrices: 'OrderedDict[Tuple[str, str], Tuple[ComplianceIndex, pd.DataFrame]]' = OrderedDict()
+_matrices_lock = threading.Lock()
+
+
+def compliance_matrix(ccids: pd.Series, cenvids: pd.Series, costs: pd.Series,
+                      index: ComplianceIndex) -> pd.DataFrame:
+    """Compliance of every CCID in an upload from one grouped aggregation.
+
+    Rows are classified with ``classify_cenvids`` (Missing counts blank, NaN and
+    None cells; Invalid is every other non-compliant CENVID) and aggregated per
+    normalized CCID. Cost Impact sums ``costs`` (numeric, NaN as 0) over the
+    non-compliant rows. Sorted by Cost Impact, largest first.
+    """
+    status = classify_cenvids(ccids, cenvids, index)['Compliance Status']
+    ccid_codes, ccid_values = normalized_codes(ccids)
+    compliant = (status == STATUS_COMPLIANT).to_numpy()
+    rows = pd.DataFrame({
+        'CCID': ccid_values[ccid_codes] if len(ccid_values) else np.array([], dtype=object),
+        'Compliant': compliant,
+        'Missing CENVID': (status == STATUS_MISSING).to_numpy(),
+        'Cost Impact': np.where(compliant, 0.0, pd.to_numeric(costs, errors='coerce').fillna(0).to_numpy(dtype=float)),
+    })
+    matrix = rows.groupby('CCID', sort=False).agg(**{
+        'Total': ('Compliant', 'size'),
+        'Compliant': ('Compliant', 'sum'),
+        'Missing CENVID': ('Missing CENVID', 'sum'),
+        'Cost Impact': ('Cost Impact', 'sum'),
+    })
+    matrix['Non-Compliant'] = matrix['Total'] - matrix['Compliant']
+    matrix['Invalid CENVID'] = matrix['Non-Compliant'] - matrix['Missing CENVID']
+    matrix['Compliance %'] = (matrix['Compliant'] / matrix['Total'] * 100).round(2)
+    matrix['In Rules'] = matrix.index.isin(list(index.keys()))
+    return matrix[MATRIX_COLUMNS].sort_values('Cost Impact', ascending=False, kind='stable')
+
+
+def cached_compliance_matrix(upload_key: str, scope: str, index: ComplianceIndex,
+                             columns: Callable[[], Tuple[pd.Series, pd.Series, pd.Series]]) -> pd.DataFrame:
+    """compliance_matrix memoized per upload content hash and scope (e.g. 'snapshots').
+
+    ``columns`` returns the (CCIDs, CENVIDs, costs) to aggregate and only runs
+    on a miss, so reruns for the same upload (such as switching the CCID
+    selectbox) are a dictionary lookup until the rules file is reloaded.
+    """
+    key = (upload_key, scope)
+    with _matrices_lock:
+        cached = _matrices.get(key)
+        if cached is not None and cached[0] is index:
+            _matrices.move_to_end(key)
+            return cached[1]
+
+    matrix = compliance_matrix(*columns(), index)
+    with _matrices_lock:
+        _matrices[key] = (index, matrix)
+        while len(_matrices) > MATRIX_CACHE_ENTRIES:
+            _matrices.popitem(last=False)
+    return matrix
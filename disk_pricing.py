@@ -0,0 +1,179 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from catalog_cache import CompiledCatalog, clean_price_column, load_compiled_catalog
+
+# Export columns that may hold the disk SKU (e.g. 'Premium_LRS') and the region, in order of preference
+SKU_COLUMNS = ['Disk SKU', 'Storage Type', 'SKU']
+REGION_COLUMNS = ['Location', 'Region']
+# Exports without a region column are priced at this region's rates
+DEFAULT_DISK_REGION = 'eastus'
+
+# One step down per SKU, keeping the redundancy: Premium SSD -> Standard SSD -> Standard HDD
+DOWNGRADE_TARGETS = {
+    'Premium_LRS': 'StandardSSD_LRS',
+    'Premium_ZRS': 'StandardSSD_ZRS',
+    'StandardSSD_LRS': 'Standard_LRS',
+}
+
+RECOMMENDATION_COLUMNS = ['Disk Name', 'o9 CCID', 'Size', 'Region', 'Current SKU', 'Current Tier',
+                          'Current Monthly Price', 'Recommended SKU', 'Recommended Tier',
+                          'Recommended Monthly Price', 'Monthly Savings']
+
+
+def prepare_disk_pricing_data(records: list) -> pd.DataFrame:
+    """Build the disk tier catalog frame from the parsed pricing records"""
+    df = pd.DataFrame(records)
+    df['skuName'] = df['skuName'].astype(str).str.strip()
+    df['region'] = normalize_regions(df['region'])
+    df['sizeGiB'] = df['sizeGiB'].astype(int)
+    df['monthlyPrice'] = clean_price_column(df['monthlyPrice'])
+    return df.sort_values(['skuName', 'region', 'sizeGiB'], kind='stable').reset_index(drop=True)
+
+
+def load_disk_pricing_catalog(path: str) -> CompiledCatalog:
+    """Load the disk tier catalog through the compiled, process-wide cache"""
+    return load_compiled_catalog(path, prepare_disk_pricing_data)
+
+
+def normalize_regions(values: pd.Series) -> pd.Series:
+    """'East US' / 'eastus ' -> 'eastus'"""
+    return values.astype(str).str.lower().str.replace(' ', '', regex=False)
+
+
+def normalize_skus(values: pd.Series) -> pd.Series:
+    """SKU names trimmed; blanks become 'nan' (no catalog SKU)"""
+    return values.astype(str).str.strip()
+
+
+def normalized_codes(values: pd.Series, normalize) -> Tuple[np.ndarray, np.ndarray]:
+    """Codes into the normalized distinct values, so normalize() never sees every row"""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    normalized_codes, normalized = pd.factorize(normalize(pd.Series(uniques, dtype=object)))
+    return normalized_codes[codes], np.asarray(normalized, dtype=object)
+
+
+def first_column(df: pd.DataFrame, candidates) -> Optional[str]:
+    """The first of the candidate column names present in df"""
+    return next((column for column in candidates if column in df.columns), None)
+
+
+class DiskPricing:
+    """Tier lookup built once per disk catalog (through CompiledCatalog.derive).
+
+    Every (SKU, region) pair gets a group code and each catalog band the key
+    ``code * band_width + size``, so one sorted key array covers the whole
+    catalog. Pricing an upload is then a single np.searchsorted: the first
+    band at or above each disk's size within its own group.
+    """
+
+    def __init__(self, catalog_df: pd.DataFrame):
+        frame = catalog_df[catalog_df['monthlyPrice'].notna()]
+        pairs = pd.Series(list(zip(frame['skuName'], frame['region'])), dtype=object)
+        group_codes, groups = pd.factorize(pairs)
+        self.groups = {pair: code for code, pair in enumerate(groups)}
+
+        sizes = frame['sizeGiB'].to_numpy(dtype=np.int64)
+        self.band_width = int(sizes.max()) + 1 if len(sizes) else 1
+        keys = group_codes.astype(np.int64) * self.band_width + sizes
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.key_groups = group_codes[order]
+        self.tiers = frame['tier'].to_numpy(dtype=object)[order]
+        self.sizes = sizes[order]
+        self.prices = frame['monthlyPrice'].to_numpy(dtype=float)[order]
+
+    def group_table(self, sku_values, region_values) -> np.ndarray:
+        """Catalog group of every (SKU, region) combination, -1 where the catalog has none"""
+        return np.array([[self.groups.get((sku, region), -1) for region in region_values]
+                         for sku in sku_values], dtype=np.int64).reshape(len(sku_values), len(region_values))
+
+    def lookup(self, skus: pd.Series, regions: pd.Series, sizes: pd.Series) -> pd.DataFrame:
+        """Smallest tier of each disk's SKU and region that fits its size.
+
+        Returns 'Tier', 'Tier Size (GiB)' and 'Tier Monthly Price' aligned with
+        the input; disks with an unknown SKU/region or a size above the largest
+        band are left unpriced (None/NaN).
+        """
+        sku_codes, sku_values = normalized_codes(skus, normalize_skus)
+        region_codes, region_values = normalized_codes(regions, normalize_regions)
+        groups = self.group_table(sku_values, region_values)[sku_codes, region_codes]
+        return self.lookup_groups(groups, sizes)
+
+    def lookup_groups(self, groups: np.ndarray, sizes: pd.Series) -> pd.DataFrame:
+        """lookup() for disks already mapped to catalog groups (see group_table)"""
+        unpriced = pd.DataFrame({'Tier': None, 'Tier Size (GiB)': np.nan, 'Tier Monthly Price': np.nan},
+                                index=sizes.index)
+        if not len(self.keys):
+            return unpriced
+
+        needed = np.ceil(pd.to_numeric(sizes, errors='coerce').to_numpy(dtype=float))
+        known = (groups >= 0) & np.isfinite(needed) & (needed > 0)
+
+        disk_keys = groups * self.band_width + np.where(known, needed, 0).astype(np.int64)
+        positions = np.minimum(np.searchsorted(self.keys, disk_keys, side='left'), len(self.keys) - 1)
+        # A size past the group's largest band lands in the next group (or off the end)
+        matched = known & (self.key_groups[positions] == groups) & (self.sizes[positions] >= needed)
+
+        return unpriced.assign(**{
+            'Tier': np.where(matched, self.tiers[positions], None),
+            'Tier Size (GiB)': np.where(matched, self.sizes[positions], np.nan),
+            'Tier Monthly Price': np.where(matched, self.prices[positions], np.nan),
+        })
+
+
+def disk_regions(df: pd.DataFrame) -> pd.Series:
+    """Region of every disk, DEFAULT_DISK_REGION when the export has no region column"""
+    region_column = first_column(df, REGION_COLUMNS)
+    if region_column is None:
+        return pd.Series(DEFAULT_DISK_REGION, index=df.index)
+    return df[region_column].fillna(DEFAULT_DISK_REGION)
+
+
+def price_disks(df: pd.DataFrame, pricing: DiskPricing) -> pd.DataFrame:
+    """The disks with their catalog tier and list price, plus 'Estimated Monthly Cost':
+    the exported 'Cost 30-Day' where present, the tier's list price where it is blank"""
+    sku_column = first_column(df, SKU_COLUMNS)
+    skus = df[sku_column] if sku_column else pd.Series('', index=df.index)
+    sizes = df['Size'] if 'Size' in df.columns else pd.Series(np.nan, index=df.index)
+    tiers = pricing.lookup(skus, disk_regions(df), sizes)
+
+    priced = df.assign(**{column: tiers[column] for column in tiers.columns})
+    exported = priced['Cost 30-Day'] if 'Cost 30-Day' in priced.columns else pd.Series(np.nan, index=df.index)
+    priced['Estimated Monthly Cost'] = exported.fillna(priced['Tier Monthly Price'])
+    return priced
+
+
+def recommend_downgrades(df: pd.DataFrame, pricing: DiskPricing) -> pd.DataFrame:
+    """One row per disk whose one-step cheaper SKU (DOWNGRADE_TARGETS) has a cheaper tier
+    at its size and region, highest monthly savings first"""
+    sku_column = first_column(df, SKU_COLUMNS)
+    if sku_column is None or 'Size' not in df.columns or df.empty:
+        return pd.DataFrame(columns=RECOMMENDATION_COLUMNS)
+
+    # Only the distinct SKUs and regions are normalized and mapped to catalog groups
+    sku_codes, sku_values = normalized_codes(df[sku_column], normalize_skus)
+    region_codes, region_values = normalized_codes(disk_regions(df), normalize_regions)
+    target_values = np.array([DOWNGRADE_TARGETS.get(sku) for sku in sku_values], dtype=object)
+    current = pricing.lookup_groups(pricing.group_table(sku_values, region_values)[sku_codes, region_codes], df['Size'])
+    cheaper = pricing.lookup_groups(pricing.group_table(target_values, region_values)[sku_codes, region_codes],
+                                    df['Size'])
+
+    savings = current['Tier Monthly Price'] - cheaper['Tier Monthly Price']
+    keep = (savings > 0).to_numpy()
+    recommendations = pd.DataFrame({
+        'Disk Name': df['Disk Name'] if 'Disk Name' in df.columns else df.index.astype(str),
+        'o9 CCID': df['o9 CCID'] if 'o9 CCID' in df.columns else None,
+        'Size': df['Size'],
+        'Region': region_values[region_codes],
+        'Current SKU': sku_values[sku_codes],
+        'Current Tier': current['Tier'],
+        'Current Monthly Price': current['Tier Monthly Price'],
+        'Recommended SKU': target_values[sku_codes],
+        'Recommended Tier': cheaper['Tier'],
+        'Recommended Monthly Price': cheaper['Tier Monthly Price'],
+        'Monthly Savings': savings.round(2),
+    }, index=df.index, columns=RECOMMENDATION_COLUMNS)[keep]
+    return recommendations.sort_values('Monthly Savings', ascending=False, kind='stable').reset_index(drop=True)
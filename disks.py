@@ -1,13 +1,27 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
-import json
+from datetime import date, datetime
 import os
-from collections import defaultdict
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from compliance_index import cached_compliance_matrix, load_compliance_index
+from disk_pricing import DiskPricing, load_disk_pricing_catalog, price_disks, recommend_downgrades
+from ingest_cache import prepared_upload_cached, upload_content_key
+from report_cache import cached_report, timing_caption
+from resource_age import age_in_days, format_ages, normalize_timestamp_columns
+from tag_analysis import build_tag_index, cached_tag_index, compliance_flags, compliant_mask, tag_coverage
+
+# Tags every disk is expected to carry
+REQUIRED_TAGS = ['o9 CCID', 'o9 CENVID']
+
+DISK_PRICING_PATH = r"C:\Users\sarat\Desktop\FinOps\azure-disk-pricing.json"
+
+# Upload preparation: numeric columns, timestamp columns and the day counts shown next to each timestamp.
+# Timestamps are replaced by 'N months ago' text; the parsed values stay in '<column> Raw'.
+NUMERIC_COLUMNS = ['Size', 'Cost Since Created', 'Cost 30-Day']
+AGE_DAY_COLUMNS = {'Create Time': 'Age (Days)', 'Last Detachment Time': 'Days Since Detachment'}
+RAW_TIMESTAMP_COLUMNS = [f"{column} Raw" for column in AGE_DAY_COLUMNS]
 
 # --- EMAIL CONFIGURATION (for dashboard use only) ---
 EMAIL_CONFIG = {
@@ -52,53 +66,6 @@ st.markdown("""
 def normalize_ccid(ccid):
     return str(ccid).upper().strip()
 
-def format_creation_time_custom(creation_date, current_date):
-    delta = relativedelta(current_date, creation_date)
-    parts = []
-    if delta.years > 0:
-        parts.append(f"{delta.years} year{'s' if delta.years > 1 else ''}")
-    if delta.months > 0:
-        parts.append(f"{delta.months} month{'s' if delta.months > 1 else ''}")
-    if delta.days > 0 and delta.years == 0:
-        parts.append(f"{delta.days} day{'s' if delta.days > 1 else ''}")
-    if not parts:
-        return "0 days ago"
-    return ' '.join(parts) + ' ago'
-
-def to_naive(dt):
-    if hasattr(dt, 'tzinfo') and dt.tzinfo is not None:
-        return dt.tz_convert(None).to_pydatetime() if hasattr(dt, 'tz_convert') else dt.replace(tzinfo=None)
-    return dt
-
-def load_compliance_data(json_file_path):
-    """Load tag compliance data from JSON file"""
-    try:
-        with open(json_file_path, 'r') as file:
-            compliance_data = json.load(file)
-        
-        ccid_cenvid_mapping = defaultdict(set)
-        
-        for entry in compliance_data:
-            ccid = entry.get("CCID (Unique Per Customer)", "").strip()
-            if not ccid or ccid == "":
-                continue
-            
-            # Extract all non-empty CENVIDs for this CCID
-            cenvids = []
-            for key in ["CENVID (PRE PROD)", "CENVID (PROD)", "CENVID (DEV)", "CENVID (STG)", "CENVID(PSR)"]:
-                cenvid = entry.get(key, "").strip()
-                if cenvid and cenvid != "":
-                    cenvids.append(cenvid)
-            
-            # Add all valid CENVIDs for this CCID
-            ccid_cenvid_mapping[ccid].update(cenvids)
-        
-        # Convert sets to lists for easier handling
-        return {ccid: list(cenvids) for ccid, cenvids in ccid_cenvid_mapping.items()}
-    
-    except Exception as e:
-        return {}
-
 def check_tag_compliance(df, ccid, compliance_mapping):
     """Check tag compliance for unattached disks"""
     if not compliance_mapping:
@@ -110,7 +77,7 @@ def check_tag_compliance(df, ccid, compliance_mapping):
             'status': 'No compliance data available'
         }
     
-    if ccid not in compliance_mapping:
+    if normalize_ccid(ccid) not in compliance_mapping:
         return {
             'total_instances': len(df),
             'compliant_instances': 0,
@@ -119,14 +86,13 @@ def check_tag_compliance(df, ccid, compliance_mapping):
             'status': f'CCID {ccid} not found in compliance mapping'
         }
     
-    valid_cenvids = compliance_mapping[ccid]
+    # The index is uppercase, so CENVIDs are compared case-insensitively as in snapshots.py
+    valid_cenvids = compliance_mapping[normalize_ccid(ccid)]
     total_instances = len(df)
     compliant_count = 0
     
-    for idx, row in df.iterrows():
-        instance_cenvid = row.get('o9 CENVID', '')
-        if instance_cenvid in valid_cenvids:
-            compliant_count += 1
+    if 'o9 CENVID' in df.columns:
+        compliant_count = int(compliant_mask(df['o9 CENVID'], valid_cenvids).sum())
     
     compliance_percentage = (compliant_count / total_instances * 100) if total_instances > 0 else 0
     
@@ -140,48 +106,19 @@ def check_tag_compliance(df, ccid, compliance_mapping):
 
 def analyze_tag_coverage(df):
     """Analyze tag coverage across all instances"""
-    total_instances = len(df)
-    
-    if total_instances == 0:
-        return {
-            'total_instances': 0,
-            'tagged_instances': 0,
-            'untagged_instances': 0,
-            'coverage_percentage': 0,
-            'missing_tags': {}
-        }
-    
-    # Define required tags
-    required_tags = ['o9 CCID', 'o9 CENVID']
-    
-    tagged_count = 0
-    missing_tags = {tag: 0 for tag in required_tags}
-    
-    for idx, row in df.iterrows():
-        instance_has_all_tags = True
-        
-        for tag in required_tags:
-            tag_value = str(row.get(tag, '')).strip()
-            if not tag_value or tag_value == '' or tag_value.lower() == 'nan':
-                missing_tags[tag] += 1
-                instance_has_all_tags = False
-        
-        if instance_has_all_tags:
-            tagged_count += 1
-    
-    coverage_percentage = (tagged_count / total_instances * 100) if total_instances > 0 else 0
-    
-    return {
-        'total_instances': total_instances,
-        'tagged_instances': tagged_count,
-        'untagged_instances': total_instances - tagged_count,
-        'coverage_percentage': round(coverage_percentage, 2),
-        'missing_tags': missing_tags
-    }
+    return tag_coverage(df, REQUIRED_TAGS)
 
-def generate_dashboard_report(summary_stats, selected_ccid):
+def build_disk_tag_index(df, compliance_mapping):
+    """Tag presence plus CENVID validity for every disk in the upload"""
+    flags = {}
+    if 'o9 CCID' in df.columns and 'o9 CENVID' in df.columns:
+        flags = compliance_flags(df['o9 CCID'], df['o9 CENVID'], compliance_mapping)
+    return build_tag_index(df, REQUIRED_TAGS, flags)
+
+def generate_dashboard_report(summary_stats, selected_ccid, current_time=None):
     """Generate full-width dashboard-style report"""
-    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    if current_time is None:
+        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
     # Get oldest disk date for display
     oldest_disk_date = "N/A"
@@ -411,13 +348,32 @@ def generate_dashboard_report(summary_stats, selected_ccid):
     
     return dashboard_html
 
-def analyze_unattached_disks(df, ccid, compliance_mapping):
-    """Analyze unattached disks data"""
-    current_date = datetime.now()
+def prepare_disk_upload(df, current_date):
+    """Everything the views share, done once per upload: drop pvc disks, coerce
+    numbers, parse timestamps to naive UTC, sort by Last Detachment Time
+    (oldest first) and derive the age columns"""
+    df = normalize_timestamp_columns(df, AGE_DAY_COLUMNS)
+    for column in NUMERIC_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
     
     # Filter out disks with IDs starting with 'pvc' (as mentioned in notes)
     df = df[~df['Disk Name'].str.startswith('pvc', na=False)]
+    if 'Last Detachment Time' in df.columns:
+        df = df.sort_values('Last Detachment Time', ascending=True, kind='stable')
+    else:
+        df = df.copy()
     
+    for column, days_column in AGE_DAY_COLUMNS.items():
+        if column in df.columns:
+            raw = df[column]
+            df.insert(df.columns.get_loc(column) + 1, days_column, age_in_days(raw, current_date))
+            df[column] = format_ages(raw, current_date)
+            df[f"{column} Raw"] = raw
+    return df
+
+def analyze_unattached_disks(df, ccid, compliance_mapping):
+    """Analyze unattached disks data (a prepare_disk_upload frame)"""
     # Basic statistics
     total_disks = len(df)
     
@@ -459,14 +415,13 @@ def analyze_unattached_disks(df, ccid, compliance_mapping):
     else:
         max_cost_disk = "N/A"
     
-    # Find oldest disk by last detachment time
-    df['Last Detachment Time'] = pd.to_datetime(df['Last Detachment Time'])
-    # Convert to naive datetime to avoid timezone comparison issues
-    df['Last Detachment Time'] = df['Last Detachment Time'].dt.tz_localize(None)
-    
-    oldest_disk_row = df.loc[df['Last Detachment Time'].idxmin()]
-    oldest_disk_age = format_creation_time_custom(oldest_disk_row['Last Detachment Time'], current_date)
-    oldest_disk = f"{oldest_disk_row.get('Disk Name', 'Unknown')} ({oldest_disk_age})"
+    # Find oldest disk by last detachment time; the age text was derived at preparation
+    detachment_times = df['Last Detachment Time Raw'].dropna()
+    if len(detachment_times) > 0:
+        oldest_disk_row = df.loc[detachment_times.idxmin()]
+        oldest_disk = f"{oldest_disk_row.get('Disk Name', 'Unknown')} ({oldest_disk_row['Last Detachment Time']})"
+    else:
+        oldest_disk = "N/A"
     
     # Check tag compliance
     tag_compliance = check_tag_compliance(df, ccid, compliance_mapping)
@@ -485,6 +440,63 @@ def analyze_unattached_disks(df, ccid, compliance_mapping):
         'tag_coverage': tag_coverage
     }
 
+def display_compliance_matrix(df, upload_key, compliance_mapping):
+    """Fleet overview: compliance of every CCID in the upload, aggregated once per upload"""
+    if not compliance_mapping or 'o9 CCID' not in df.columns or 'o9 CENVID' not in df.columns:
+        return
+    
+    def matrix_columns():
+        # pvc disks were already dropped by prepare_disk_upload
+        return df['o9 CCID'], df['o9 CENVID'], df['Cost Since Created']
+    
+    matrix = cached_compliance_matrix(upload_key, 'disks', compliance_mapping, matrix_columns)
+    st.header("🗂️ Fleet Compliance Matrix (all CCIDs)")
+    st.dataframe(
+        matrix,
+        use_container_width=True,
+        column_config={
+            'Compliance %': st.column_config.NumberColumn(format="%.2f%%"),
+            'Cost Impact': st.column_config.NumberColumn(format="$%.2f"),
+        }
+    )
+
+def display_disk_pricing(df):
+    """Catalog tier of every disk, list prices for blank 30-day costs and Premium -> Standard downgrades"""
+    try:
+        catalog = load_disk_pricing_catalog(DISK_PRICING_PATH)
+    except (OSError, ValueError) as e:
+        st.info(f"Disk pricing catalog not available ({e}); tier pricing and downgrade recommendations are skipped.")
+        return
+    pricing = catalog.derive('disk_pricing', DiskPricing)
+    
+    priced = price_disks(df, pricing)
+    recommendations = recommend_downgrades(df, pricing)
+    blank_costs = priced['Cost 30-Day'].isna() if 'Cost 30-Day' in priced.columns else pd.Series(True, index=priced.index)
+    estimated = priced.loc[blank_costs, 'Estimated Monthly Cost']
+    
+    st.header("💲 Disk Tier Pricing & Downgrade Recommendations")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Estimated Monthly Cost", f"${priced['Estimated Monthly Cost'].sum():,.2f}")
+    with col2:
+        st.metric("Blank 30-Day Costs Priced from Catalog", f"{int(estimated.notna().sum())} (${estimated.sum():,.2f})")
+    with col3:
+        st.metric("Downgrade Savings / Month", f"${recommendations['Monthly Savings'].sum():,.2f}")
+    
+    if recommendations.empty:
+        st.success("No disk has a cheaper tier one step down at its size.")
+        return
+    st.dataframe(
+        recommendations,
+        use_container_width=True,
+        column_config={
+            column: st.column_config.NumberColumn(format="$%.2f")
+            for column in ['Current Monthly Price', 'Recommended Monthly Price', 'Monthly Savings']
+        }
+    )
+    st.caption("List prices from the disk pricing catalog; one step down per SKU "
+               "(Premium SSD → Standard SSD → Standard HDD), same redundancy, region and size band.")
+
 def main():
     """Main application function"""
     st.markdown('<div class="main-header"><h1>🔍 Unattached EBS Volumes Analysis</h1></div>', unsafe_allow_html=True)
@@ -492,8 +504,8 @@ def main():
     # Hardcoded JSON file path for compliance data
     json_file_path = "tag_compliance.json"
     
-    # Load compliance data from hardcoded path
-    compliance_mapping = load_compliance_data(json_file_path)
+    # Shared compliance index, rebuilt only when the file changes
+    compliance_mapping = load_compliance_index(json_file_path)
     
     # File upload for unattached disks data (drag and drop Excel support)
     uploaded_file = st.file_uploader(
@@ -504,11 +516,16 @@ def main():
     
     if uploaded_file is not None:
         try:
-            # Load the Excel data
-            df = pd.read_excel(uploaded_file)
+            # Load and prepare the Excel data once per distinct file (ages are derived once per day)
+            df = prepared_upload_cached(uploaded_file, f"disks {date.today().isoformat()}",
+                                        lambda raw: prepare_disk_upload(raw, datetime.now()))
             
             # Display basic info
-            st.info(f"📊 Loaded {len(df)} unattached disk records from {uploaded_file.name}")
+            st.info(f"📊 Loaded {len(df)} unattached disk records (excluding pvc disks) from {uploaded_file.name}")
+            upload_df = df
+            upload_key = upload_content_key(uploaded_file)
+            tag_index = cached_tag_index(upload_key, 'disks', lambda: build_disk_tag_index(upload_df, compliance_mapping),
+                                         depends_on=compliance_mapping)
             
             # CCID filter (exactly like snapshots.py)
             if 'o9 CCID' in df.columns:
@@ -524,12 +541,7 @@ def main():
                 selected_ccid = 'All'
                 ccid_for_compliance = 'All'
             
-            # Sort by Last Detachment Time (oldest first)
-            if 'Last Detachment Time' in df.columns:
-                df['Last Detachment Time'] = pd.to_datetime(df['Last Detachment Time'])
-                df = df.sort_values('Last Detachment Time', ascending=True)
-            
-            # Store filtered data
+            # Store filtered data (already sorted by Last Detachment Time, oldest first)
             st.session_state.filtered_df = df
             
             # Analyze the data
@@ -538,36 +550,40 @@ def main():
                 st.session_state.summary_stats = summary_stats
                 st.session_state.analysis_complete = True
                 
-                # Generate and display dashboard report
-                dashboard_html = generate_dashboard_report(summary_stats, selected_ccid)
+                # Generate and display dashboard report (re-rendered only when the summary changes;
+                # the generated time is filled into the cached template on every run)
+                dashboard_html = cached_report(
+                    'disks', (summary_stats, selected_ccid),
+                    lambda generated: generate_dashboard_report(summary_stats, selected_ccid, generated),
+                    fields={'generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
                 st.components.v1.html(dashboard_html, height=900, scrolling=True)
+                st.caption(timing_caption('disks'))
                 
                 # Data table with full width - Filter out PVC disks for display
                 st.header("📋 Detailed Disk Information")
                 
-                # Filter out PVC disks from the display table
-                display_df = df[~df['Disk Name'].str.startswith('pvc', na=False)].copy()
+                # pvc disks were dropped and the age columns derived when the upload was prepared
+                display_df = df.drop(columns=RAW_TIMESTAMP_COLUMNS, errors='ignore')
                 
-                # Replace Create Time column with age format
-                if 'Create Time' in display_df.columns:
-                    current_date = datetime.now()
-                    display_df['Create Time'] = display_df['Create Time'].apply(lambda x: format_creation_time_custom(pd.to_datetime(x).replace(tzinfo=None), current_date))
-                
-                # Replace Last Detachment Time column with age format
-                if 'Last Detachment Time' in display_df.columns:
-                    current_date = datetime.now()
-                    display_df['Last Detachment Time'] = display_df['Last Detachment Time'].apply(
-                        lambda x: format_creation_time_custom(pd.to_datetime(x).replace(tzinfo=None), current_date) if pd.notna(x) and x != '' else 'N/A'
-                    )
+                # Tag filters are bitmask queries on the upload's tag index
+                has_tags = st.multiselect("Has tags", tag_index.tags, key="disk_has_tags")
+                missing_tags = st.multiselect("Missing tags", tag_index.tags, key="disk_missing_tags")
+                display_df = tag_index.select(display_df, has_tags, missing_tags)
                 
                 st.dataframe(display_df, use_container_width=True)
                 
+                # Tier pricing for the selected disks
+                display_disk_pricing(df)
+                
                 # Button to save results to dashboard/server
                 if st.button("Save Results to Dashboard", key="save_summary_button"):
                     with open("disks_summary.html", "w", encoding="utf-8") as f:
                         f.write(dashboard_html)
                     st.success("Disk dashboard report saved! You can now access the styled report from the saved HTML file.")
                     st.balloons()
+                
+                # Every CCID in the upload, independent of the selection above
+                display_compliance_matrix(upload_df, upload_key, compliance_mapping)
             
             else:
                 st.warning("No data matches the selected filters.")
@@ -0,0 +1,195 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Parsed uploads are kept on local disk (Parquet) so a re-upload in a new session skips parsing
+INGEST_CACHE_DIR = os.environ.get(
+    'INGEST_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'cloud-infra-dashboard', 'ingest')
+)
+INGEST_CACHE_MAX_BYTES = int(os.environ.get('INGEST_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+MEMORY_CACHE_ENTRIES = 8
+
+# Process-wide LRU of parsed frames: content key -> DataFrame (survives Streamlit reruns)
+_frames: 'OrderedDict[str, pd.DataFrame]' = OrderedDict()
+_frames_lock = threading.Lock()
+
+# Process-wide LRU of prepared frames: (content key, stage) -> DataFrame
+_prepared: 'OrderedDict[Tuple[str, str], pd.DataFrame]' = OrderedDict()
+_prepared_lock = threading.Lock()
+
+# Process-wide LRU of content keys per Streamlit upload: (file_id, read options) -> key
+_upload_keys: 'OrderedDict[Tuple[str, str], str]' = OrderedDict()
+_upload_keys_lock = threading.Lock()
+UPLOAD_KEY_ENTRIES = 256
+
+
+def upload_bytes(uploaded_file) -> bytes:
+    """Raw bytes of a Streamlit upload, a file-like object or a path"""
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        with open(uploaded_file, 'rb') as file:
+            return file.read()
+    if hasattr(uploaded_file, 'getvalue'):
+        return uploaded_file.getvalue()
+    uploaded_file.seek(0)
+    return uploaded_file.read()
+
+
+def content_key(data: bytes, **read_options) -> str:
+    """SHA-256 of the uploaded bytes, qualified by the parse options"""
+    digest = hashlib.sha256(data)
+    digest.update(repr(sorted(read_options.items())).encode())
+    return digest.hexdigest()
+
+
+def upload_content_key(uploaded_file, **read_options) -> str:
+    """content_key of an upload, hashed once per Streamlit upload.
+
+    Streamlit hands out a new UploadedFile on every rerun but keeps its
+    file_id, so the SHA-256 is memoized per file_id and a rerun (including
+    the cached readers and the views' index lookups) costs no hashing.
+    Paths and other file-like objects are hashed on every call.
+    """
+    file_id = getattr(uploaded_file, 'file_id', None)
+    if file_id is None:
+        return content_key(upload_bytes(uploaded_file), **read_options)
+
+    memo_key = (file_id, repr(sorted(read_options.items())))
+    with _upload_keys_lock:
+        if memo_key in _upload_keys:
+            _upload_keys.move_to_end(memo_key)
+            return _upload_keys[memo_key]
+
+    key = content_key(upload_bytes(uploaded_file), **read_options)
+    with _upload_keys_lock:
+        _upload_keys[memo_key] = key
+        while len(_upload_keys) > UPLOAD_KEY_ENTRIES:
+            _upload_keys.popitem(last=False)
+    return key
+
+
+CACHE_SUFFIX = '.parquet'
+
+
+def cache_path(key: str, cache_dir: Optional[str] = None) -> str:
+    """Disk copy of the parse for a key"""
+    return os.path.join(cache_dir or INGEST_CACHE_DIR, key + CACHE_SUFFIX)
+
+
+def read_disk_copy(key: str, cache_dir: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """Load a cached parse, restoring NaN (not None) for blanks in text columns like read_excel"""
+    path = cache_path(key, cache_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_parquet(path)
+    except Exception:
+        return None
+    for column in df.columns[df.dtypes == object]:
+        df[column] = df[column].fillna(np.nan)
+    os.utime(path)  # Mark as recently used for eviction
+    return df
+
+
+def write_disk_copy(df: pd.DataFrame, key: str, cache_dir: Optional[str], max_bytes: int):
+    """Store a parse on disk as Parquet.
+
+    Frames Arrow cannot type (e.g. a column mixing numbers and text) get no
+    disk copy and are parsed again on the next cold upload; they are never
+    pickled, since the cache directory is not trusted for code execution.
+    """
+    path = cache_path(key, cache_dir)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(temp_path, index=False)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return
+    evict_disk_cache(os.path.dirname(path), max_bytes)
+
+
+def evict_disk_cache(cache_dir: str, max_bytes: int):
+    """Delete least recently used disk copies until the directory fits in max_bytes"""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(CACHE_SUFFIX):
+            stat = os.stat(os.path.join(cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+            total -= size
+        except OSError:
+            pass
+
+
+def read_excel_cached(uploaded_file, cache_dir: Optional[str] = None,
+                      max_bytes: Optional[int] = None, **read_options) -> pd.DataFrame:
+    """pd.read_excel keyed by the SHA-256 of the uploaded bytes.
+
+    The first upload of a workbook is parsed once; reruns get a copy of the
+    in-memory frame and re-uploads of the same bytes (in any session) load the
+    disk copy instead of going through openpyxl again. Callers may modify
+    the returned frame freely.
+    """
+    key = upload_content_key(uploaded_file, **read_options)
+
+    with _frames_lock:
+        if key in _frames:
+            _frames.move_to_end(key)
+            return _frames[key].copy()
+
+    df = read_disk_copy(key, cache_dir)
+    if df is None:
+        df = pd.read_excel(io.BytesIO(upload_bytes(uploaded_file)), **read_options)
+        write_disk_copy(df, key, cache_dir, INGEST_CACHE_MAX_BYTES if max_bytes is None else max_bytes)
+
+    with _frames_lock:
+        _frames[key] = df
+        while len(_frames) > MEMORY_CACHE_ENTRIES:
+            _frames.popitem(last=False)
+    return df.copy()
+
+
+def prepared_upload_cached(uploaded_file, stage: str, prepare: Callable[[pd.DataFrame], pd.DataFrame],
+                           **read_options) -> pd.DataFrame:
+    """prepare(read_excel_cached(uploaded_file)) memoized per upload content hash and stage name.
+
+    For the per-upload work every view shares (exclusions, type coercion,
+    sorting, derived columns). The cached frame is shared by every session in
+    the process, so each call gets a copy that callers may modify freely.
+    """
+    key = (upload_content_key(uploaded_file, **read_options), stage)
+    with _prepared_lock:
+        if key in _prepared:
+            _prepared.move_to_end(key)
+            return _prepared[key].copy()
+
+    df = prepare(read_excel_cached(uploaded_file, **read_options))
+    with _prepared_lock:
+        _prepared[key] = df
+        while len(_prepared) > MEMORY_CACHE_ENTRIES:
+            _prepared.popitem(last=False)
+    return df.copy()
+
+
+def clear_ingest_cache():
+    """Drop the in-memory frames (disk copies are kept)"""
+    with _frames_lock:
+        _frames.clear()
+    with _prepared_lock:
+        _prepared.clear()
+    with _upload_keys_lock:
+        _upload_keys.clear()
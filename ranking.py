@@ -0,0 +1,72 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def top_k_positions(values, k: Optional[int] = None) -> np.ndarray:
+    """Positions of the k largest values, largest first (all positions if k is None).
+
+    Uses np.argpartition, so only the k winners get sorted: O(n + k log k)
+    instead of a full sort. Ties keep their original order and NaN ranks last.
+    """
+    values = np.asarray(values, dtype=float)
+    keys = np.where(np.isnan(values), -np.inf, values)
+    n = len(keys)
+    if k is None or k >= n:
+        return np.argsort(-keys, kind='stable')
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    threshold = -np.partition(-keys, k - 1)[k - 1]
+    above = np.flatnonzero(keys > threshold)
+    tied = np.flatnonzero(keys == threshold)[:k - len(above)]
+    candidates = np.concatenate([above, tied])
+    return candidates[np.lexsort((candidates, -keys[candidates]))]
+
+
+def top_k(frame: pd.DataFrame, column: str, k: Optional[int] = None) -> pd.DataFrame:
+    """Rows with the k largest values of a numeric column, largest first"""
+    return frame.iloc[top_k_positions(frame[column].to_numpy(dtype=float), k)]
+
+
+def top_k_split(frame: pd.DataFrame, column: str, k: Optional[int]) -> Tuple[pd.DataFrame, int, float]:
+    """top_k plus the count and column total of the rows left out (for "remaining K rows" footers)"""
+    values = frame[column].to_numpy(dtype=float)
+    positions = top_k_positions(values, k)
+    remaining_count = len(values) - len(positions)
+    remaining_total = float(np.nansum(values) - np.nansum(values[positions])) if remaining_count else 0.0
+    return frame.iloc[positions], remaining_count, remaining_total
+
+
+class StreamingTopK:
+    """Top-k rows by a numeric column over a stream of DataFrame chunks.
+
+    Each chunk is reduced with top_k and merged into the running winners, so
+    memory stays at k rows plus one chunk and nothing is ever fully sorted.
+    Row count and column total are tracked for remaining-rows footers.
+    """
+
+    def __init__(self, column: str, k: int):
+        self.column = column
+        self.k = k
+        self.best: Optional[pd.DataFrame] = None
+        self.count = 0
+        self.total = 0.0
+
+    def update(self, chunk: pd.DataFrame):
+        """Fold one chunk into the running top k"""
+        self.count += len(chunk)
+        self.total += float(np.nansum(chunk[self.column].to_numpy(dtype=float)))
+        winners = top_k(chunk, self.column, self.k)
+        if self.best is not None:
+            # Earlier winners go first so ties keep stream order
+            winners = top_k(pd.concat([self.best, winners]), self.column, self.k)
+        self.best = winners
+
+    def result(self) -> Tuple[pd.DataFrame, int, float]:
+        """(top rows largest first, remaining row count, remaining column total)"""
+        if self.best is None:
+            return pd.DataFrame(columns=[self.column]), 0, 0.0
+        kept_total = float(np.nansum(self.best[self.column].to_numpy(dtype=float)))
+        return self.best, self.count - len(self.best), self.total - kept_total
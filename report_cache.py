@@ -0,0 +1,112 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+REPORT_CACHE_ENTRIES = 32
+
+# Process-wide LRU of rendered reports: content hash -> HTML template (survives Streamlit reruns)
+_reports: 'OrderedDict[str, str]' = OrderedDict()
+_reports_lock = threading.Lock()
+# Per report scope: hits, renders, total render seconds and the latest call
+_timings: Dict[str, Dict] = {}
+
+
+def _canonical(value):
+    """JSON stand-in for values json cannot encode; frames are reduced to a content digest"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        try:
+            row_hashes = pd.util.hash_pandas_object(value)
+        except TypeError:
+            # Cells such as lists are not hashable; their text is
+            row_hashes = pd.util.hash_pandas_object(value.astype(str))
+        digest = hashlib.sha256(row_hashes.to_numpy().tobytes())
+        labels = value.columns if isinstance(value, pd.DataFrame) else [value.name]
+        digest.update(repr(list(labels)).encode())
+        return f"frame:{digest.hexdigest()}"
+    return str(value)
+
+
+def stable_hash(*inputs) -> str:
+    """SHA-256 of the inputs rendered as canonical JSON (sorted keys), stable across reruns and processes"""
+    payload = json.dumps(inputs, sort_keys=True, default=_canonical)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def field_placeholder(name: str) -> str:
+    """Marker a cached template holds in place of a per-call field"""
+    return f"{{{{report:{name}}}}}"
+
+
+def cached_report(scope: str, inputs, render: Callable[..., str],
+                  fields: Optional[Mapping[str, str]] = None) -> str:
+    """render() memoized on a stable hash of (scope, inputs).
+
+    ``inputs`` must cover everything the HTML depends on except ``fields``:
+    values such as the generated timestamp that change per call. render()
+    receives a placeholder keyword for each field, the template it returns is
+    what gets cached, and the caller's field values are substituted into it on
+    every call, so a reused report never carries another call's timestamp.
+    Every call is timed for report_timings().
+    """
+    start = time.perf_counter()
+    fields = dict(fields or {})
+    key = stable_hash(scope, inputs, sorted(fields))
+    with _reports_lock:
+        template = _reports.get(key)
+        if template is not None:
+            _reports.move_to_end(key)
+
+    cached = template is not None
+    if not cached:
+        template = render(**{name: field_placeholder(name) for name in fields})
+        with _reports_lock:
+            _reports[key] = template
+            while len(_reports) > REPORT_CACHE_ENTRIES:
+                _reports.popitem(last=False)
+
+    html = template
+    for name, value in fields.items():
+        html = html.replace(field_placeholder(name), str(value))
+
+    seconds = time.perf_counter() - start
+    with _reports_lock:
+        timing = _timings.setdefault(scope, {'hits': 0, 'renders': 0, 'render_seconds': 0.0})
+        if cached:
+            timing['hits'] += 1
+        else:
+            timing['renders'] += 1
+            timing['render_seconds'] += seconds
+        timing['last_cached'] = cached
+        timing['last_seconds'] = seconds
+    return html
+
+
+def report_timings() -> Dict[str, Dict]:
+    """Snapshot of the per-scope counters kept by cached_report"""
+    with _reports_lock:
+        return {scope: dict(timing) for scope, timing in _timings.items()}
+
+
+def timing_caption(scope: str) -> str:
+    """One-line summary of the latest cached_report call for a scope, for st.caption"""
+    timing = report_timings().get(scope)
+    if timing is None:
+        return ""
+    source = "reused from cache" if timing['last_cached'] else "rendered"
+    return (f"⏱️ Report {source} in {timing['last_seconds'] * 1000:.1f} ms "
+            f"({timing['renders']} rendered, {timing['hits']} reused since startup)")
+
+
+def clear_report_cache():
+    """Drop every cached report and reset the timings"""
+    with _reports_lock:
+        _reports.clear()
+        _timings.clear()
@@ -0,0 +1,33 @@
+import pandas as pd
+
+# Email bodies above ~100KB get clipped by Gmail; one styled row is roughly 1KB
+DEFAULT_EMAIL_ROW_LIMIT = 100
+
+REMAINING_ROWS_TEMPLATE = """
+                <tr style="background-color: #eeeeee;">
+                    <td colspan="{colspan}" style="padding: 10px; text-align: center; font-style: italic; color: #555;">… remaining {count} {rows} totalling ${total:,.2f}</td>
+                </tr>
+        """
+
+
+def render_table(head: str, row_template: str, rows: pd.DataFrame, tail: str,
+                 remaining_count: int = 0, remaining_total: float = 0.0, colspan: int = 1,
+                 remaining_template: str = REMAINING_ROWS_TEMPLATE) -> str:
+    """HTML table: head, one row_template per row of ``rows``, an optional
+    "remaining K rows totalling $X" row, then tail.
+
+    row_template fields are the column names of ``rows``. Rows are formatted
+    into a list and joined once, so render time is linear in the rows shown;
+    pair with ranking.top_k_split to keep email bodies bounded.
+    """
+    names = list(rows.columns)
+    columns = [rows[name].to_numpy() for name in names]
+
+    parts = [head]
+    parts.extend(row_template.format_map(dict(zip(names, values))) for values in zip(*columns))
+    if remaining_count > 0:
+        parts.append(remaining_template.format(colspan=colspan, count=remaining_count,
+                                               rows='row' if remaining_count == 1 else 'rows',
+                                               total=remaining_total))
+    parts.append(tail)
+    return ''.join(parts)
@@ -0,0 +1,167 @@
+import re
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+NS_PER_DAY = 86_400 * 10 ** 9
+
+# Exports carry ISO 8601 timestamps; a column with other values is parsed per
+# element ('mixed') for that call only, so one odd upload never slows later ones
+DEFAULT_TIMESTAMP_FORMAT = 'ISO8601'
+OFFSET_SUFFIX = re.compile(r'[+-]\d{2}:\d{2}')
+
+
+def format_age_parts(years: int, months: int, days: int) -> str:
+    """'N years M months ago' text; days are shown only for ages under a year"""
+    parts = []
+    if years > 0:
+        parts.append(f"{years} year{'s' if years > 1 else ''}")
+    if months > 0:
+        parts.append(f"{months} month{'s' if months > 1 else ''}")
+    if days > 0 and years == 0:
+        parts.append(f"{days} day{'s' if days > 1 else ''}")
+    if not parts:
+        return "0 days ago"
+    return ' '.join(parts) + ' ago'
+
+
+def naive_datetimes(values) -> pd.Series:
+    """Naive UTC datetime64[ns] Series, as parse_timestamps gives it; columns
+    normalized at ingest pass straight through"""
+    return parse_timestamps(pd.Series(values))
+
+
+def parse_timestamps(values: pd.Series, format: Optional[str] = None) -> pd.Series:
+    """Parse a timestamp column once to naive UTC datetime64[ns]; unparseable values become NaT.
+
+    Offsets are applied (converted to UTC), naive values are taken as UTC.
+    The column is parsed with ``format`` (ISO 8601 by default) and, when that
+    misses values, again per element for this call only.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.tz_convert(None) if values.dt.tz is not None else values
+
+    column_format = format or DEFAULT_TIMESTAMP_FORMAT
+    parsed = None
+    if column_format == 'ISO8601':
+        parsed = parse_iso_fixed_offsets(values)
+    if parsed is None:
+        parsed = pd.to_datetime(values, utc=True, format=column_format, errors='coerce')
+    unparsed = values[parsed.isna() & values.notna()]
+    if column_format != 'mixed' and (unparsed.astype(str).str.strip() != '').any():
+        parsed = pd.to_datetime(values, utc=True, format='mixed', errors='coerce')
+    return parsed.dt.tz_convert(None)
+
+
+def parse_iso_fixed_offsets(values: pd.Series) -> Optional[pd.Series]:
+    """Fast path for ISO strings that all end in '+HH:MM'/'-HH:MM' or 'Z': the
+    offsets are split off and applied as integers, so pandas only parses naive
+    timestamps (about 20x faster than letting it build a tzinfo per row).
+    Returns a UTC Series, or None when the column does not have that shape.
+    """
+    if values.dtype != object:
+        return None
+    present = values.notna().to_numpy()
+    text = values[present]
+    if not len(text) or not text.map(type).eq(str).all():
+        return None
+
+    if text.str.endswith('Z').all():
+        stamps, offset_minutes = text.str[:-1], 0
+    else:
+        suffixes = text.str[-6:]
+        codes, distinct = pd.factorize(suffixes)
+        if not all(OFFSET_SUFFIX.fullmatch(suffix) for suffix in distinct):
+            return None
+        minutes = np.array([(1 if suffix[0] == '+' else -1) * (int(suffix[1:3]) * 60 + int(suffix[4:6]))
+                            for suffix in distinct], dtype=np.int64)
+        stamps, offset_minutes = text.str[:-6], minutes[codes]
+
+    naive = pd.to_datetime(stamps, format='ISO8601', errors='coerce')
+    utc = naive - pd.to_timedelta(offset_minutes, unit='m')
+    result = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    result[present] = utc.to_numpy()
+    return result.dt.tz_localize('UTC')
+
+
+def normalize_timestamp_columns(df: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    """Parse the given timestamp columns (where present) to naive UTC at ingest, in place"""
+    for column in columns:
+        if column in df.columns:
+            df[column] = parse_timestamps(df[column])
+    return df
+
+
+def add_months(year: np.ndarray, month: np.ndarray, day: np.ndarray, time_of_day: np.ndarray,
+               months: np.ndarray) -> np.ndarray:
+    """Dates shifted by whole months, clipping the day to the end of the month (like relativedelta)"""
+    month_index = year * 12 + (month - 1) + months
+    month_start = (month_index - (1970 * 12)).astype('datetime64[M]')
+    month_days = ((month_start + 1).astype('datetime64[D]') - month_start.astype('datetime64[D]')).astype(np.int64)
+    dates = month_start.astype('datetime64[D]') + (np.minimum(day, month_days) - 1)
+    return dates.astype('datetime64[ns]').astype(np.int64) + time_of_day
+
+
+def age_components(created, current_date: datetime) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Years, months and days between each creation date and current_date.
+
+    Matches dateutil's relativedelta(current_date, created) for past dates
+    without building one object per row; future dates give zero. The fourth
+    array flags missing dates.
+    """
+    created = naive_datetimes(created)
+    missing = created.isna().to_numpy()
+    now = pd.Timestamp(current_date).tz_localize(None).value
+
+    stamps = created.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    stamps = np.where(missing, now, stamps)
+    days_since_epoch = np.floor_divide(stamps, NS_PER_DAY)
+    time_of_day = stamps - days_since_epoch * NS_PER_DAY
+    dates = days_since_epoch.astype('datetime64[D]')
+    year = dates.astype('datetime64[Y]').astype(np.int64) + 1970
+    month = dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    day = (dates - dates.astype('datetime64[M]').astype('datetime64[D]')).astype(np.int64) + 1
+
+    now_date = pd.Timestamp(now)
+    months = (now_date.year - year) * 12 + (now_date.month - month)
+    anniversary = add_months(year, month, day, time_of_day, months)
+    # The month anniversary can overshoot now by less than a month; step back once
+    overshoot = anniversary > now
+    months = np.where(overshoot, months - 1, months)
+    anniversary = np.where(overshoot, add_months(year, month, day, time_of_day, months), anniversary)
+    days = np.floor_divide(now - anniversary, NS_PER_DAY)
+
+    future = stamps > now
+    years = np.where(future, 0, months // 12)
+    months = np.where(future, 0, months % 12)
+    days = np.where(future, 0, days)
+    return years, months, days, missing
+
+
+def format_ages(created, current_date: datetime, missing_label: str = 'N/A') -> pd.Series:
+    """'N years M months ago' for every date, as dateutil.relativedelta would give it.
+
+    Only the distinct (years, months, days) combinations are formatted, so the
+    cost is a few array operations plus a handful of f-strings.
+    """
+    years, months, days, missing = age_components(created, current_date)
+    shown_days = np.where(years == 0, days, 0)
+    keys = (years * 12 + months) * 32 + shown_days
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    labels = np.array([format_age_parts(int(key // 32 // 12), int(key // 32 % 12), int(key % 32))
+                       for key in unique_keys], dtype=object)
+    result = labels[inverse] if len(labels) else np.array([], dtype=object)
+    result[missing] = missing_label
+    index = created.index if isinstance(created, pd.Series) else None
+    return pd.Series(result, index=index, dtype=object)
+
+
+def age_in_days(created, current_date: datetime) -> pd.Series:
+    """Whole days between each date and current_date (NaN for missing dates), for sorting and bucketing"""
+    created_naive = naive_datetimes(created)
+    days = (pd.Timestamp(current_date).tz_localize(None) - created_naive).dt.days
+    if isinstance(created, pd.Series):
+        days.index = created.index
+    return days
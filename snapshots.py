@@ -1,10 +1,15 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 from datetime import datetime
-from dateutil.relativedelta import relativedelta
-import json
-import os
-from collections import defaultdict
+from compliance_index import (COMPLIANCE_STATUSES, STATUS_OTHER_CCID, cached_compliance_matrix,
+                              classify_cenvids, load_compliance_index)
+from ingest_cache import prepared_upload_cached, upload_content_key
+from ranking import top_k, top_k_positions, top_k_split
+from report_cache import cached_report, timing_caption
+from report_tables import DEFAULT_EMAIL_ROW_LIMIT, render_table
+from resource_age import age_in_days, format_ages, normalize_timestamp_columns
+from tag_analysis import build_tag_index, cached_tag_index, compliance_flags, compliant_mask, normalized_tags
 
 # --- EMAIL CONFIGURATION (for dashboard use only) ---
 EMAIL_CONFIG = {
@@ -49,55 +54,41 @@ st.markdown("""
 def normalize_ccid(ccid):
     return str(ccid).upper().strip()
 
-def format_creation_time_custom(creation_date, current_date):
-    delta = relativedelta(current_date, creation_date)
-    parts = []
-    if delta.years > 0:
-        parts.append(f"{delta.years} year{'s' if delta.years > 1 else ''}")
-    if delta.months > 0:
-        parts.append(f"{delta.months} month{'s' if delta.months > 1 else ''}")
-    if delta.days > 0 and delta.years == 0:
-        parts.append(f"{delta.days} day{'s' if delta.days > 1 else ''}")
-    if not parts:
-        return "0 days ago"
-    return ' '.join(parts) + ' ago'
-
-def to_naive(dt):
-    if hasattr(dt, 'tzinfo') and dt.tzinfo is not None:
-        return dt.tz_convert(None).to_pydatetime() if hasattr(dt, 'tz_convert') else dt.replace(tzinfo=None)
-    return dt
-
-def load_compliance_data(json_file_path):
-    """Load tag compliance data from JSON file"""
-    try:
-        with open(json_file_path, 'r') as file:
-            compliance_data = json.load(file)
-        
-        ccid_cenvid_mapping = defaultdict(set)
-        
-        for entry in compliance_data:
-            ccid = entry.get("CCID (Unique Per Customer)", "").strip().upper()  # Normalize to uppercase
-            if not ccid or ccid == "":
-                continue
-                
-            # Extract all non-empty CENVIDs for this CCID
-            cenvids = []
-            for key in ["CENVID (PRE PROD)", "CENVID (PROD)", "CENVID (DEV)", "CENVID (STG)", "CENVID(PSR)"]:
-                cenvid = entry.get(key, "").strip().upper()  # Normalize to uppercase
-                if cenvid and cenvid != "":
-                    cenvids.append(cenvid)
-            
-            # Add all valid CENVIDs for this CCID
-            ccid_cenvid_mapping[ccid].update(cenvids)
-        
-        # Convert sets to lists for easier handling
-        return {ccid: list(cenvids) for ccid, cenvids in ccid_cenvid_mapping.items()}
+NON_COMPLIANT_COLUMNS = ['snapshot_id', 'ccid', 'current_cenvid', 'valid_cenvids', 'issue',
+                         'creation_time', 'cost_since_created', 'cost_numeric']
+
+def parse_cost_column(values):
+    """Costs such as '$1,234.50' as floats; unparseable values become 0"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float).fillna(0)
+    return pd.to_numeric(
+        values.astype(str).str.replace('$', '', regex=False).str.replace(',', '', regex=False),
+        errors='coerce'
+    ).fillna(0)
+
+def prepare_snapshot_upload(df):
+    """Everything the views share, done once per upload: parse timestamps to naive
+    UTC, normalize the CCID and CENVID tags and sort by Cost Since Created (largest
+    billed first, newest first among equal costs), so per-CCID subsets keep that order"""
+    df = normalize_timestamp_columns(df, ['Creation Time'])
+    
+    # Normalize CCID and CENVID columns
+    if 'o9 CCID tag' in df.columns:
+        df['o9 CCID tag'] = df['o9 CCID tag'].astype(str).str.upper().str.strip()
     
-    except Exception as e:
-        return {}
+    if 'o9 CENVID tag' in df.columns:
+        df['o9 CENVID tag'] = df['o9 CENVID tag'].astype(str).str.upper().str.strip()
+    
+    df['o9 CCID tag'] = df['o9 CCID tag'].apply(normalize_ccid)
+    return df.sort_values(by=['Cost Since Created', 'Creation Time'], ascending=False)
 
 def check_tag_compliance(df, ccid, compliance_mapping):
-    """Check tag compliance for snapshots"""
+    """Check tag compliance for snapshots.
+    
+    Works on whole columns: CENVIDs are matched with isin against the CCID's valid set
+    and the non-compliant rows are returned as a DataFrame (NON_COMPLIANT_COLUMNS).
+    """
+    no_details = pd.DataFrame(columns=NON_COMPLIANT_COLUMNS)
     if not compliance_mapping:
         return {
             'total_instances': len(df),
@@ -105,7 +96,7 @@ def check_tag_compliance(df, ccid, compliance_mapping):
             'non_compliant_instances': len(df),
             'compliance_percentage': 0,
             'status': 'No compliance data file found',
-            'non_compliant_details': []
+            'non_compliant_details': no_details
         }
     
     # Normalize ccid to uppercase
@@ -118,13 +109,12 @@ def check_tag_compliance(df, ccid, compliance_mapping):
             'non_compliant_instances': len(df),
             'compliance_percentage': 0,
             'status': f'CCID {ccid} not found in compliance mapping',
-            'non_compliant_details': []
+            'non_compliant_details': no_details
         }
     
     valid_cenvids = compliance_mapping[ccid]
+    valid_cenvid_list = sorted(valid_cenvids)
     total_instances = len(df)
-    compliant_count = 0
-    non_compliant_details = []
     
     # Check for CENVID column variations
     cenvid_column = None
@@ -141,25 +131,31 @@ def check_tag_compliance(df, ccid, compliance_mapping):
             'non_compliant_instances': total_instances,
             'compliance_percentage': 0,
             'status': 'CENVID column not found',
-            'non_compliant_details': []
+            'non_compliant_details': no_details
         }
     
-    for idx, row in df.iterrows():
-        instance_cenvid = str(row.get(cenvid_column, '')).upper().strip()
-        snapshot_id = row.get('Snapshot ID', f'snapshot_{idx}')
-        
-        if instance_cenvid in valid_cenvids:
-            compliant_count += 1
-        else:
-            non_compliant_details.append({
-                'snapshot_id': snapshot_id,
-                'ccid': ccid,
-                'current_cenvid': instance_cenvid if instance_cenvid else 'None',
-                'valid_cenvids': valid_cenvids,
-                'issue': 'Invalid CENVID' if instance_cenvid else 'Missing CENVID',
-                'creation_time': row.get('Creation Time', 'N/A'),
-                'cost_since_created': row.get('Cost Since Created', 'N/A')
-            })
+    compliant = compliant_mask(df[cenvid_column], valid_cenvids)
+    compliant_count = int(compliant.sum())
+    
+    non_compliant = df[~compliant]
+    current_cenvids = normalized_tags(non_compliant[cenvid_column])
+    # Only an empty tag is Missing; blank cells read as 'NAN' stay Invalid, as in the row-by-row check
+    missing = current_cenvids == ''
+    if 'Snapshot ID' in df.columns:
+        snapshot_ids = non_compliant['Snapshot ID']
+    else:
+        snapshot_ids = 'snapshot_' + non_compliant.index.astype(str).to_series(index=non_compliant.index)
+    non_compliant_details = pd.DataFrame({
+        'snapshot_id': snapshot_ids,
+        'ccid': ccid,
+        'current_cenvid': current_cenvids.mask(missing, 'None'),
+        'valid_cenvids': pd.Series([valid_cenvid_list] * len(non_compliant), index=non_compliant.index, dtype=object),
+        'issue': pd.Series('Invalid CENVID', index=non_compliant.index).mask(missing, 'Missing CENVID'),
+        'creation_time': non_compliant['Creation Time'] if 'Creation Time' in df.columns else 'N/A',
+        'cost_since_created': non_compliant['Cost Since Created'] if 'Cost Since Created' in df.columns else 'N/A',
+        # Parsed once here so the rankings and totals never reparse cost strings
+        'cost_numeric': parse_cost_column(non_compliant['Cost Since Created']) if 'Cost Since Created' in df.columns else 0.0
+    }, columns=NON_COMPLIANT_COLUMNS).reset_index(drop=True)
     
     compliance_percentage = (compliant_count / total_instances * 100) if total_instances > 0 else 0
     
@@ -173,25 +169,16 @@ def check_tag_compliance(df, ccid, compliance_mapping):
     }
 
 def display_non_compliant_instances(non_compliant_details):
-    """Display non-compliant instances in a simple tabular format"""
-    if not non_compliant_details:
+    """Display non-compliant instances (a check_tag_compliance details frame) in a simple tabular format"""
+    if non_compliant_details.empty:
         st.success("🎉 All snapshots are compliant!")
         return
     
     st.markdown("### 🚩 Non-Compliant Snapshots")
     st.markdown(f"Found **{len(non_compliant_details)}** non-compliant snapshots that need attention:")
     
-    # Convert to DataFrame and sort by cost (highest first)
-    non_compliant_df = pd.DataFrame(non_compliant_details)
-    
-    # Convert cost to numeric for proper sorting
-    non_compliant_df['cost_numeric'] = pd.to_numeric(
-        non_compliant_df['cost_since_created'].astype(str).str.replace('$', '').str.replace(',', ''), 
-        errors='coerce'
-    ).fillna(0)
-    
-    # Sort by cost descending
-    non_compliant_df_sorted = non_compliant_df.sort_values(by='cost_numeric', ascending=False)
+    # Rank by cost (highest first)
+    non_compliant_df_sorted = top_k(non_compliant_details, 'cost_numeric')
     
     # Prepare display DataFrame - simple format
     display_df = pd.DataFrame({
@@ -214,9 +201,9 @@ def display_non_compliant_instances(non_compliant_details):
     )
     
     # Summary statistics - STYLED TO MATCH TAG COMPLIANCE COVERAGE
-    missing_cenvid = len([item for item in non_compliant_details if item['issue'] == 'Missing CENVID'])
-    invalid_cenvid = len([item for item in non_compliant_details if item['issue'] == 'Invalid CENVID'])
-    total_cost = non_compliant_df['cost_numeric'].sum()
+    missing_cenvid = int((non_compliant_details['issue'] == 'Missing CENVID').sum())
+    invalid_cenvid = int((non_compliant_details['issue'] == 'Invalid CENVID').sum())
+    total_cost = non_compliant_details['cost_numeric'].sum()
     
     # Create HTML table with a cool blue-purple gradient styling
     summary_html = f"""
@@ -255,29 +242,73 @@ def display_non_compliant_instances(non_compliant_details):
     - **Priority**: Address highest cost items first to maximize impact
     """)
 
-
-def generate_non_compliant_html_table(non_compliant_details):
-    """Generate HTML table for non-compliant instances for email reports"""
-    if not non_compliant_details:
-        return ""
-    
-    # Convert to DataFrame and sort by cost (highest first)
-    non_compliant_df = pd.DataFrame(non_compliant_details)
+def display_cross_ccid_check(df, compliance_mapping):
+    """Classify every snapshot in the upload against all CCIDs and list CENVIDs registered to another customer"""
+    if not compliance_mapping or 'o9 CENVID tag' not in df.columns:
+        return
     
-    # Convert cost to numeric for proper sorting
-    non_compliant_df['cost_numeric'] = pd.to_numeric(
-        non_compliant_df['cost_since_created'].astype(str).str.replace('$', '').str.replace(',', ''), 
-        errors='coerce'
-    ).fillna(0)
+    snapshots = df[~df['Snapshot ID'].str.startswith('pvc', na=False)]
+    classified = classify_cenvids(snapshots['o9 CCID tag'], snapshots['o9 CENVID tag'], compliance_mapping)
+    counts = classified['Compliance Status'].value_counts()
+    
+    st.markdown("### 🔀 Cross-CCID Tag Check (all CCIDs)")
+    for column, status in zip(st.columns(len(COMPLIANCE_STATUSES)), COMPLIANCE_STATUSES):
+        column.metric(status, int(counts.get(status, 0)))
+    
+    misassigned = classified['Compliance Status'] == STATUS_OTHER_CCID
+    if misassigned.any():
+        misassigned_df = pd.DataFrame({
+            'Snapshot ID': snapshots.loc[misassigned, 'Snapshot ID'],
+            'CCID': snapshots.loc[misassigned, 'o9 CCID tag'],
+            'Current CENVID': snapshots.loc[misassigned, 'o9 CENVID tag'],
+            'Registered To CCID': classified.loc[misassigned, 'Owner CCID'],
+            'Cost Since Created': snapshots.loc[misassigned, 'Cost Since Created'],
+        })
+        st.markdown(f"Found **{len(misassigned_df)}** snapshots tagged with a CENVID that belongs to another CCID:")
+        ranked = top_k_positions(parse_cost_column(misassigned_df['Cost Since Created']).to_numpy(dtype=float))
+        st.dataframe(
+            misassigned_df.iloc[ranked],
+            use_container_width=True,
+            height=300,
+            hide_index=True
+        )
+
+def display_compliance_matrix(df, upload_key, compliance_mapping):
+    """Fleet overview: compliance of every CCID in the upload, aggregated once per upload"""
+    if not compliance_mapping or 'o9 CENVID tag' not in df.columns:
+        return
     
-    # Sort by cost descending
-    non_compliant_df_sorted = non_compliant_df.sort_values(by='cost_numeric', ascending=False)
+    def matrix_columns():
+        snapshots = df[~df['Snapshot ID'].str.startswith('pvc', na=False)]
+        return (snapshots['o9 CCID tag'], snapshots['o9 CENVID tag'],
+                parse_cost_column(snapshots['Cost Since Created']))
     
-    # Generate HTML table with inline CSS for email compatibility
-    html_table = f"""
+    matrix = cached_compliance_matrix(upload_key, 'snapshots', compliance_mapping, matrix_columns)
+    st.markdown("### 🗂️ Fleet Compliance Matrix (all CCIDs)")
+    st.dataframe(
+        matrix,
+        use_container_width=True,
+        height=400,
+        column_config={
+            'Compliance %': st.column_config.NumberColumn(format="%.2f%%"),
+            'Cost Impact': st.column_config.NumberColumn(format="$%.2f"),
+        }
+    )
+
+# Tag columns indexed for the snapshot table's tag filters
+SNAPSHOT_TAGS = ['o9 CCID tag', 'o9 CENVID tag']
+
+def build_snapshot_tag_index(df, compliance_mapping):
+    """Tag presence plus CENVID validity for every snapshot in the upload"""
+    flags = {}
+    if 'o9 CCID tag' in df.columns and 'o9 CENVID tag' in df.columns:
+        flags = compliance_flags(df['o9 CCID tag'], df['o9 CENVID tag'], compliance_mapping)
+    return build_tag_index(df, SNAPSHOT_TAGS, flags)
+
+NON_COMPLIANT_EMAIL_HEAD = """
     <div style="margin: 20px 0; padding: 15px; border: 2px solid #f44336; border-radius: 8px; background-color: #ffebee;">
         <h3 style="color: #d32f2f; margin-top: 0; font-family: Arial, sans-serif;">
-            🚩 Non-Compliant Snapshots ({len(non_compliant_details)} instances)
+            🚩 Non-Compliant Snapshots ({count} instances)
         </h3>
         <p style="color: #666; font-family: Arial, sans-serif; margin-bottom: 15px;">
             The following snapshots require immediate attention for tag compliance. Sorted by highest cost impact.
@@ -298,35 +329,21 @@ def generate_non_compliant_html_table(non_compliant_details):
             </thead>
             <tbody>
     """
-    
-    # Add table rows
-    for rank, (_, row) in enumerate(non_compliant_df_sorted.iterrows(), 1):
-        # Determine row color based on issue type
-        row_color = "#ffcdd2" if row['issue'] == 'Missing CENVID' else "#ffe0b2"
-        issue_icon = "❌" if row['issue'] == 'Missing CENVID' else "⚠️"
-        
-        # Format valid CENVIDs
-        valid_cenvids_str = ', '.join(row['valid_cenvids'])
-        if len(valid_cenvids_str) > 50:  # Truncate if too long
-            valid_cenvids_str = valid_cenvids_str[:47] + "..."
-        
-        # Format current CENVID
-        current_cenvid = row['current_cenvid'] if row['current_cenvid'] and row['current_cenvid'] != 'None' else '<span style="color: #999; font-style: italic;">None</span>'
-        
-        html_table += f"""
+
+NON_COMPLIANT_EMAIL_ROW = """
                 <tr style="background-color: {row_color};">
                     <td style="padding: 8px; text-align: center; font-weight: bold; color: #d32f2f;">#{rank}</td>
-                    <td style="padding: 8px; font-family: monospace; font-weight: bold;">{row['snapshot_id']}</td>
-                    <td style="padding: 8px; font-weight: bold;">{row['ccid']}</td>
+                    <td style="padding: 8px; font-family: monospace; font-weight: bold;">{snapshot_id}</td>
+                    <td style="padding: 8px; font-weight: bold;">{ccid}</td>
                     <td style="padding: 8px;">{current_cenvid}</td>
-                    <td style="padding: 8px; font-size: 11px;">{valid_cenvids_str}</td>
-                    <td style="padding: 8px; font-weight: bold;">{issue_icon} {row['issue']}</td>
-                    <td style="padding: 8px;">{row['creation_time']}</td>
-                    <td style="padding: 8px; font-weight: bold; color: #d32f2f;">{row['cost_since_created']}</td>
+                    <td style="padding: 8px; font-size: 11px;">{valid_cenvids}</td>
+                    <td style="padding: 8px; font-weight: bold;">{issue_icon} {issue}</td>
+                    <td style="padding: 8px;">{creation_time}</td>
+                    <td style="padding: 8px; font-weight: bold; color: #d32f2f;">{cost_since_created}</td>
                 </tr>
         """
-    
-    html_table += """
+
+NON_COMPLIANT_EMAIL_TAIL = """
             </tbody>
         </table>
         
@@ -340,12 +357,47 @@ def generate_non_compliant_html_table(non_compliant_details):
         </div>
     </div>
     """
+
+def generate_non_compliant_html_table(non_compliant_details, limit=DEFAULT_EMAIL_ROW_LIMIT):
+    """Generate HTML table for non-compliant instances for email reports.
+    
+    Only the `limit` highest-cost rows are rendered (None for all); the rest are
+    summarized in a "remaining K rows totalling $X" row.
+    """
+    if non_compliant_details.empty:
+        return ""
     
-    return html_table
+    # Highest cost first; only the rows that are shown get ranked
+    shown, remaining_count, remaining_total = top_k_split(non_compliant_details, 'cost_numeric', limit)
+    
+    # Display columns for the rendered rows only
+    missing = (shown['issue'] == 'Missing CENVID').to_numpy()
+    valid_cenvids = shown['valid_cenvids'].map(', '.join)
+    current_cenvid = shown['current_cenvid']
+    rows = shown.assign(
+        rank=range(1, len(shown) + 1),
+        row_color=np.where(missing, "#ffcdd2", "#ffe0b2"),
+        issue_icon=np.where(missing, "❌", "⚠️"),
+        valid_cenvids=valid_cenvids.where(valid_cenvids.str.len() <= 50, valid_cenvids.str[:47] + "..."),
+        current_cenvid=current_cenvid.where(
+            current_cenvid.astype(bool) & (current_cenvid != 'None'),
+            '<span style="color: #999; font-style: italic;">None</span>'
+        )
+    )
+    
+    return render_table(
+        NON_COMPLIANT_EMAIL_HEAD.format(count=len(non_compliant_details)),
+        NON_COMPLIANT_EMAIL_ROW,
+        rows,
+        NON_COMPLIANT_EMAIL_TAIL,
+        remaining_count=remaining_count,
+        remaining_total=remaining_total,
+        colspan=8
+    )
 
 def generate_compliance_summary_table(non_compliant_details):
     """Generate compliance summary table for dashboard"""
-    if not non_compliant_details:
+    if non_compliant_details.empty:
         return """
         <div style="margin: 20px 0; padding: 15px; border: 2px solid #4caf50; border-radius: 8px; background-color: #e8f5e8;">
             <h3 style="color: #2e7d32; margin-top: 0; font-family: Arial, sans-serif;">
@@ -355,18 +407,12 @@ def generate_compliance_summary_table(non_compliant_details):
         </div>
         """
     
-    # Group by issue type
-    missing_cenvid = [item for item in non_compliant_details if item['issue'] == 'Missing CENVID']
-    invalid_cenvid = [item for item in non_compliant_details if item['issue'] == 'Invalid CENVID']
+    # Count by issue type
+    missing_cenvid = int((non_compliant_details['issue'] == 'Missing CENVID').sum())
+    invalid_cenvid = int((non_compliant_details['issue'] == 'Invalid CENVID').sum())
     
     # Calculate total cost impact
-    total_cost = 0
-    for item in non_compliant_details:
-        try:
-            cost_str = str(item['cost_since_created']).replace('$', '').replace(',', '')
-            total_cost += float(cost_str)
-        except:
-            pass
+    total_cost = non_compliant_details['cost_numeric'].sum()
     
     return f"""
     <div style="margin: 20px 0; padding: 15px; border: 2px solid #ff9800; border-radius: 8px; background-color: #fff8e1;">
@@ -385,13 +431,13 @@ def generate_compliance_summary_table(non_compliant_details):
             <tbody>
                 <tr style="background-color: #ffcdd2;">
                     <td style="padding: 8px;">❌ Missing CENVID</td>
-                    <td style="padding: 8px; text-align: center; font-weight: bold;">{len(missing_cenvid)}</td>
-                    <td style="padding: 8px; text-align: center; font-weight: bold;">{(len(missing_cenvid)/len(non_compliant_details)*100):.1f}%</td>
+                    <td style="padding: 8px; text-align: center; font-weight: bold;">{missing_cenvid}</td>
+                    <td style="padding: 8px; text-align: center; font-weight: bold;">{(missing_cenvid/len(non_compliant_details)*100):.1f}%</td>
                 </tr>
                 <tr style="background-color: #ffe0b2;">
                     <td style="padding: 8px;">⚠️ Invalid CENVID</td>
-                    <td style="padding: 8px; text-align: center; font-weight: bold;">{len(invalid_cenvid)}</td>
-                    <td style="padding: 8px; text-align: center; font-weight: bold;">{(len(invalid_cenvid)/len(non_compliant_details)*100):.1f}%</td>
+                    <td style="padding: 8px; text-align: center; font-weight: bold;">{invalid_cenvid}</td>
+                    <td style="padding: 8px; text-align: center; font-weight: bold;">{(invalid_cenvid/len(non_compliant_details)*100):.1f}%</td>
                 </tr>
                 <tr style="background-color: #ffecb3; font-weight: bold;">
                     <td style="padding: 8px;">📊 Total Non-Compliant</td>
@@ -412,9 +458,19 @@ def generate_compliance_summary_table(non_compliant_details):
 def generate_html_report():
     if not st.session_state.get('analysis_complete', False):
         return "No analysis data available."
-    df_html = st.session_state.filtered_df.to_html(index=False)
     summary = st.session_state.summary_stats
     
+    # Keyed on what the report shows: the details frame is not rendered, and 'generated' is filled in per call
+    compliance_counts = {key: value for key, value in summary.get('tag_compliance', {}).items()
+                         if key != 'non_compliant_details'}
+    report_inputs = {key: value for key, value in summary.items() if key not in ('generated', 'tag_compliance')}
+    report_inputs['tag_compliance'] = compliance_counts
+    return cached_report('snapshots', report_inputs,
+                         lambda generated: render_snapshot_report({**summary, 'generated': generated}),
+                         fields={'generated': summary['generated']})
+
+def render_snapshot_report(summary):
+    """Snapshot summary HTML for one CCID's summary_stats"""
     # Generate tag compliance section
     compliance_html = ""
     if 'tag_compliance' in summary:
@@ -494,48 +550,35 @@ def generate_html_report():
 # Styled title
 st.markdown('<div class="main-header"><h1>📊 CCID Snapshot Summary Dashboard</h1></div>', unsafe_allow_html=True)
 
-# Load compliance data at startup
-compliance_mapping = {}
+# Compliance rules are shared by every session and reloaded only when the file changes
 compliance_file_path = r"C:\Users\sarat\Desktop\FinOps\Tags.json"
-if os.path.exists(compliance_file_path):
-    compliance_mapping = load_compliance_data(compliance_file_path)
+compliance_mapping = load_compliance_index(compliance_file_path)
 
 uploaded_file = st.file_uploader(
     "Choose an Excel file", type=["xlsx"], key="snapshot_file_uploader"
 )
 
 if uploaded_file is not None:
-    df = pd.read_excel(uploaded_file)
-
-    # Normalize CCID and CENVID columns
-    if 'o9 CCID tag' in df.columns:
-        df['o9 CCID tag'] = df['o9 CCID tag'].astype(str).str.upper().str.strip()
-
-    if 'o9 CENVID tag' in df.columns:
-        df['o9 CENVID tag'] = df['o9 CENVID tag'].astype(str).str.upper().str.strip()
-
-    df['o9 CCID tag'] = df['o9 CCID tag'].apply(normalize_ccid)
-    ccid_options = df['o9 CCID tag'].unique()
+    # Timestamps, tag normalization and the cost sort are done once per distinct file
+    df = prepared_upload_cached(uploaded_file, 'snapshots', prepare_snapshot_upload)
+    upload_key = upload_content_key(uploaded_file)
+    tag_index = cached_tag_index(upload_key, 'snapshots', lambda: build_snapshot_tag_index(df, compliance_mapping),
+                                 depends_on=compliance_mapping)
+    # Offer the CCIDs in upload order (the prepared frame is sorted by cost but keeps the upload's row labels)
+    ccid_options = df['o9 CCID tag'].sort_index().unique()
     selected_ccid = st.selectbox(
         'Select CCID to filter', ccid_options, key="snapshot_ccid_select"
     )
 
     if selected_ccid:
         filtered = df[df['o9 CCID tag'] == selected_ccid]
-        filtered = filtered[~filtered['Snapshot ID'].str.startswith('pvc', na=False)]
-        filtered['Creation Time'] = pd.to_datetime(filtered['Creation Time'])
-        filtered['Creation Time'] = filtered['Creation Time'].apply(to_naive)
-
-        # Sort by Creation Time (newest first)
-        filtered = filtered.sort_values(by='Creation Time', ascending=False)
-        # Sort by Cost Since Created (largest billed first)
-        filtered = filtered.sort_values(by='Cost Since Created', ascending=False)
+        filtered = filtered[~filtered['Snapshot ID'].str.startswith('pvc', na=False)].copy()
 
         now = datetime.now()
         filtered['Creation Time Raw'] = filtered['Creation Time']
-        filtered['Creation Time'] = filtered['Creation Time Raw'].apply(
-            lambda x: format_creation_time_custom(x, now)
-        )
+        filtered['Creation Time'] = format_ages(filtered['Creation Time Raw'], now)
+        filtered.insert(filtered.columns.get_loc('Creation Time') + 1, 'Age (Days)',
+                        age_in_days(filtered['Creation Time Raw'], now))
 
         # Executive Summary values FOR SELECTED CCID ONLY
         snapshot_count = len(filtered)
@@ -571,14 +614,18 @@ if uploaded_file is not None:
 
         # Show the summary (HTML) and the scrollable table
         st.markdown(generate_html_report(), unsafe_allow_html=True)
+        st.caption(timing_caption('snapshots'))
+        # Tag filters are bitmask queries on the upload's tag index; they only narrow this table
+        has_tags = st.multiselect("Has tags", tag_index.tags, key="snapshot_has_tags")
+        missing_tags = st.multiselect("Missing tags", tag_index.tags, key="snapshot_missing_tags")
         st.dataframe(
-            filtered.drop(columns=['Creation Time Raw']),
+            tag_index.select(filtered, has_tags, missing_tags).drop(columns=['Creation Time Raw']),
             use_container_width=True,
             height=400
         )
 
         # Display non-compliant instances if any
-        if st.session_state.summary_stats['tag_compliance'].get('non_compliant_details'):
+        if not st.session_state.summary_stats['tag_compliance']['non_compliant_details'].empty:
             display_non_compliant_instances(st.session_state.summary_stats['tag_compliance']['non_compliant_details'])
 
         # Button to save results to dashboard/server
@@ -589,5 +636,9 @@ if uploaded_file is not None:
             st.success("Snapshot summary saved to dashboard! You can now send all results from the main dashboard.")
             st.balloons()
 
+    # Mis-tags across customers and the fleet matrix need the whole upload, not just the selected CCID
+    display_cross_ccid_check(df, compliance_mapping)
+    display_compliance_matrix(df, upload_key, compliance_mapping)
+
 else:
     st.info('Please upload an Excel file to get started.')
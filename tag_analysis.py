@@ -0,0 +1,174 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from compliance_index import (MISSING_TAG_VALUES, STATUS_COMPLIANT, ComplianceIndex, classify_cenvids,
+                              normalized_codes)
+
+# Index flag for rows whose CENVID is registered to the row's own CCID
+VALID_CENVID_FLAG = 'Valid CENVID'
+
+TAG_INDEX_CACHE_ENTRIES = 16
+
+# Process-wide cache: (upload key, scope) -> (dependency, TagIndex); a changed dependency rebuilds
+_tag_indexes: 'OrderedDict[Tuple[str, str], Tuple[object, TagIndex]]' = OrderedDict()
+_tag_indexes_lock = threading.Lock()
+
+
+def presence_mask(values: pd.Series) -> np.ndarray:
+    """True where a tag cell holds a value (not blank, NaN or 'None' once trimmed).
+
+    Only the distinct values are normalized, so a million rows with a few
+    hundred distinct tags cost one factorize.
+    """
+    codes, uniques = normalized_codes(values)
+    present = np.array([value not in MISSING_TAG_VALUES for value in uniques], dtype=bool)
+    return present[codes]
+
+
+def presence_masks(df: pd.DataFrame, required_tags: Sequence[str]) -> pd.DataFrame:
+    """One boolean column per required tag; a tag column absent from df is missing everywhere"""
+    return pd.DataFrame({
+        tag: presence_mask(df[tag]) if tag in df.columns else np.zeros(len(df), dtype=bool)
+        for tag in required_tags
+    }, index=df.index, columns=list(required_tags))
+
+
+def tag_coverage(df: pd.DataFrame, required_tags: Sequence[str]) -> Dict:
+    """Coverage of the required tags: resources carrying all of them and per-tag missing counts"""
+    total_instances = len(df)
+    if total_instances == 0:
+        return {
+            'total_instances': 0,
+            'tagged_instances': 0,
+            'untagged_instances': 0,
+            'coverage_percentage': 0,
+            'missing_tags': {}
+        }
+
+    masks = presence_masks(df, required_tags).to_numpy()
+    tagged_count = int(masks.all(axis=1).sum())
+    missing_counts = total_instances - masks.sum(axis=0)
+    coverage_percentage = tagged_count / total_instances * 100
+
+    return {
+        'total_instances': total_instances,
+        'tagged_instances': tagged_count,
+        'untagged_instances': total_instances - tagged_count,
+        'coverage_percentage': round(coverage_percentage, 2),
+        'missing_tags': {tag: int(count) for tag, count in zip(required_tags, missing_counts)}
+    }
+
+
+def normalized_tags(values: pd.Series) -> pd.Series:
+    """Trimmed uppercase tag values, normalizing each distinct value once"""
+    codes, uniques = normalized_codes(values)
+    return pd.Series(uniques[codes], index=values.index, dtype=object)
+
+
+def compliant_mask(values: pd.Series, valid_cenvids: Iterable[str]) -> np.ndarray:
+    """True where the normalized tag value is one of valid_cenvids (already normalized)"""
+    codes, uniques = normalized_codes(values)
+    return pd.Index(uniques).isin(list(valid_cenvids))[codes]
+
+
+class TagIndex:
+    """Per-row bitmask of which tags are present (and valid), built once per upload.
+
+    Bit i of ``bits`` is set when ``tags[i]`` holds for that row. Queries are a
+    mask and a comparison on the packed integers, and return boolean arrays
+    that combine with ``&``, ``|`` and ``~`` for arbitrary AND/OR/NOT filters:
+    ``index.where(present=['o9 CENVID'], missing=['o9 CCID'])`` finds rows with
+    a CENVID but no CCID.
+    """
+
+    def __init__(self, tags: Sequence[str], bits: np.ndarray, row_labels: pd.Index):
+        self.tags = tuple(tags)
+        self.bits = bits
+        self.row_labels = row_labels
+        self._bit_of = {tag: 1 << position for position, tag in enumerate(self.tags)}
+
+    def __len__(self) -> int:
+        return len(self.bits)
+
+    @classmethod
+    def from_masks(cls, masks: Mapping[str, np.ndarray], row_labels: pd.Index) -> 'TagIndex':
+        """Pack one boolean mask per tag into the smallest unsigned integer that fits"""
+        if len(masks) > 64:
+            raise ValueError(f"A tag index holds at most 64 tags, got {len(masks)}")
+        dtype = next(dtype for dtype in (np.uint8, np.uint16, np.uint32, np.uint64)
+                     if len(masks) <= np.dtype(dtype).itemsize * 8)
+        bits = np.zeros(len(row_labels), dtype=dtype)
+        for position, mask in enumerate(masks.values()):
+            bits |= np.asarray(mask, dtype=bool).astype(dtype) << dtype(position)
+        return cls(list(masks), bits, row_labels)
+
+    def mask(self, tags: Iterable[str]) -> int:
+        """The bits of the given tags OR-ed together (KeyError for an unindexed tag)"""
+        combined = 0
+        for tag in tags:
+            combined |= self._bit_of[tag]
+        return combined
+
+    def where(self, present: Iterable[str] = (), missing: Iterable[str] = ()) -> np.ndarray:
+        """Rows that have every ``present`` tag and none of the ``missing`` tags"""
+        wanted, unwanted = self.mask(present), self.mask(missing)
+        if wanted & unwanted:
+            # A tag cannot be both present and missing
+            return np.zeros(len(self.bits), dtype=bool)
+        return (self.bits & self.bits.dtype.type(wanted | unwanted)) == wanted
+
+    def has_any(self, tags: Iterable[str]) -> np.ndarray:
+        """Rows with at least one of the tags"""
+        return (self.bits & self.bits.dtype.type(self.mask(tags))) != 0
+
+    def missing_any(self, tags: Iterable[str]) -> np.ndarray:
+        """Rows lacking at least one of the tags"""
+        return ~self.where(present=tags)
+
+    def select(self, frame: pd.DataFrame, present: Iterable[str] = (), missing: Iterable[str] = ()) -> pd.DataFrame:
+        """Rows of ``frame`` (the indexed upload or any row subset of it) matching where()"""
+        positions = self.row_labels.get_indexer(frame.index)
+        return frame[self.where(present, missing)[positions]]
+
+
+def compliance_flags(ccids: pd.Series, cenvids: pd.Series, index: ComplianceIndex) -> Dict[str, np.ndarray]:
+    """{VALID_CENVID_FLAG: mask} for build_tag_index; empty when there are no compliance rules"""
+    if not index:
+        return {}
+    statuses = classify_cenvids(ccids, cenvids, index)['Compliance Status']
+    return {VALID_CENVID_FLAG: (statuses == STATUS_COMPLIANT).to_numpy()}
+
+
+def build_tag_index(df: pd.DataFrame, tags: Sequence[str],
+                    flags: Optional[Mapping[str, np.ndarray]] = None) -> TagIndex:
+    """TagIndex of tag presence for ``tags`` plus any precomputed boolean ``flags``
+    (such as 'Valid CENVID' from the compliance rules), aligned with df's rows"""
+    masks = {tag: mask.to_numpy() for tag, mask in presence_masks(df, tags).items()}
+    masks.update(flags or {})
+    return TagIndex.from_masks(masks, df.index)
+
+
+def cached_tag_index(upload_key: str, scope: str, build: Callable[[], TagIndex],
+                     depends_on: object = None) -> TagIndex:
+    """TagIndex memoized per upload content hash and scope (e.g. 'disks').
+
+    ``build`` only runs on a miss or when ``depends_on`` (e.g. the compliance
+    index behind a validity flag) is a different object than at build time.
+    """
+    key = (upload_key, scope)
+    with _tag_indexes_lock:
+        cached = _tag_indexes.get(key)
+        if cached is not None and cached[0] is depends_on:
+            _tag_indexes.move_to_end(key)
+            return cached[1]
+
+    tag_index = build()
+    with _tag_indexes_lock:
+        _tag_indexes[key] = (depends_on, tag_index)
+        while len(_tag_indexes) > TAG_INDEX_CACHE_ENTRIES:
+            _tag_indexes.popitem(last=False)
+    return tag_index
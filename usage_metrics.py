@@ -0,0 +1,186 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Default column names of the long-format metric export (one row per VM sample)
+METRIC_VM_COLUMN = 'Instance Name or ID'
+METRIC_CPU_COLUMN = 'CPU (%)'
+METRIC_MEMORY_COLUMN = 'Memory (%)'
+
+DEFAULT_RESOLUTION = 0.1  # Percentage points per histogram bin
+DEFAULT_CHUNKSIZE = 1_000_000
+
+
+class UtilizationSketch:
+    """Per-VM quantile sketch over CPU and memory utilization samples.
+
+    Utilization is a percentage, so each VM has a histogram over 0-100% with
+    ``resolution``-wide bins: sketches merge by adding counts, and a quantile is
+    exact up to one bin (reported at the bin's upper edge, so sizing never
+    rounds down).
+
+    Histograms are stored sparsely as sorted flat (row * bins + bin) cells with
+    their counts, so memory follows the distinct (VM, bin) pairs observed
+    rather than VMs times bins. Batches are appended as sorted runs and folded
+    in once they outgrow the merged cells, keeping each update roughly linear.
+    """
+
+    def __init__(self, resolution: float = DEFAULT_RESOLUTION):
+        self.resolution = resolution
+        self.bins = int(round(100 / resolution)) + 1
+        self.vm_ids: List = []
+        self.positions: Dict = {}
+        # Per metric: [merged cells, merged counts, pending (cells, counts) runs]
+        self.cpu = [np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint32), []]
+        self.memory = [np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint32), []]
+
+    def __len__(self) -> int:
+        return len(self.vm_ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the histogram cells and counts"""
+        total = 0
+        for cells, counts, pending in (self.cpu, self.memory):
+            total += cells.nbytes + counts.nbytes
+            total += sum(run_cells.nbytes + run_counts.nbytes for run_cells, run_counts in pending)
+        return total
+
+    def _rows_for(self, vm_ids: Iterable) -> np.ndarray:
+        """Sketch rows for the given VM ids, registering new ones"""
+        rows = np.empty(len(vm_ids), dtype=np.int64)
+        for i, vm_id in enumerate(vm_ids):
+            position = self.positions.get(vm_id)
+            if position is None:
+                position = self.positions[vm_id] = len(self.vm_ids)
+                self.vm_ids.append(vm_id)
+            rows[i] = position
+        return rows
+
+    @staticmethod
+    def _fold(cells: np.ndarray, counts: np.ndarray):
+        """Sum the counts of repeated cells; returns sorted unique cells"""
+        cells, inverse = np.unique(cells, return_inverse=True)
+        return cells, np.bincount(inverse, weights=counts, minlength=len(cells)).astype(np.uint32)
+
+    def _add(self, metric: list, cells: np.ndarray, counts: np.ndarray):
+        """Queue sorted unique cells and their counts, folding once the queue outgrows the merged cells"""
+        if not len(cells):
+            return
+        metric[2].append((cells, counts.astype(np.uint32)))
+        if sum(len(run_cells) for run_cells, _ in metric[2]) > len(metric[0]):
+            self._compact(metric)
+
+    def _compact(self, metric: list):
+        """Fold the pending runs into the merged cells"""
+        if not metric[2]:
+            return
+        runs = [(metric[0], metric[1])] + metric[2]
+        metric[0], metric[1] = self._fold(np.concatenate([cells for cells, _ in runs]),
+                                          np.concatenate([counts for _, counts in runs]))
+        metric[2] = []
+
+    def _add_samples(self, metric: list, rows: np.ndarray, values: np.ndarray):
+        """Count one metric's samples (sketch row per sample), ignoring NaN"""
+        valid = ~np.isnan(values)
+        bin_index = np.rint(np.clip(values[valid], 0, 100) / self.resolution).astype(np.int64)
+        cells, counts = np.unique(rows[valid] * self.bins + bin_index, return_counts=True)
+        self._add(metric, cells, counts)
+
+    def update(self, vm_ids: pd.Series, cpu_percent: pd.Series, memory_percent: pd.Series):
+        """Add a batch of samples (aligned Series of VM id, CPU % and memory %)"""
+        codes, uniques = pd.factorize(vm_ids, use_na_sentinel=True)
+        known = codes >= 0
+        cpu = pd.to_numeric(cpu_percent, errors='coerce').to_numpy(dtype=float)[known]
+        memory = pd.to_numeric(memory_percent, errors='coerce').to_numpy(dtype=float)[known]
+
+        rows = self._rows_for(stripped_ids(uniques))[codes[known]]
+        self._add_samples(self.cpu, rows, cpu)
+        self._add_samples(self.memory, rows, memory)
+
+    def merge(self, other: 'UtilizationSketch'):
+        """Fold another sketch (e.g. from a parallel reader) into this one"""
+        if other.bins != self.bins:
+            raise ValueError("Cannot merge sketches with different resolutions")
+        rows = self._rows_for(other.vm_ids)
+        for metric, other_metric in ((self.cpu, other.cpu), (self.memory, other.memory)):
+            other._compact(other_metric)
+            other_cells, other_counts = other_metric[0], other_metric[1]
+            cells = rows[other_cells // other.bins] * self.bins + other_cells % other.bins
+            order = np.argsort(cells)
+            self._add(metric, cells[order], other_counts[order])
+
+    def _totals(self, metric: list) -> np.ndarray:
+        """Per-VM sample counts of one metric"""
+        self._compact(metric)
+        return np.bincount(metric[0] // self.bins, weights=metric[1], minlength=len(self)).astype(np.int64)
+
+    def _quantile(self, metric: list, quantile: float) -> np.ndarray:
+        """Per-VM quantile from one running count over the sorted cells"""
+        self._compact(metric)
+        cells, counts = metric[0], metric[1]
+        totals = self._totals(metric)
+        cumulative = np.cumsum(counts, dtype=np.int64)
+        # A VM's quantile is its first cell whose running count reaches the target,
+        # offset by the samples of the VMs sorted before it
+        offsets = np.cumsum(totals) - totals
+        targets = offsets + np.maximum(np.ceil(quantile * totals), 1).astype(np.int64)
+        sampled = totals > 0
+        positions = np.searchsorted(cumulative, targets[sampled], side='left')
+        values = np.full(len(self), np.nan)
+        values[sampled] = np.minimum((cells[positions] % self.bins + 0.5) * self.resolution, 100.0)
+        return values
+
+    def quantiles(self, percentiles: Iterable[float] = (95, 99)) -> pd.DataFrame:
+        """Per-VM CPU and memory percentiles, e.g. 'P95 CPU (%)', plus the sample count"""
+        result = pd.DataFrame({METRIC_VM_COLUMN: self.vm_ids})
+        for percentile in percentiles:
+            label = f"P{percentile:g}"
+            result[f"{label} CPU (%)"] = self._quantile(self.cpu, percentile / 100)
+            result[f"{label} Memory (%)"] = self._quantile(self.memory, percentile / 100)
+        result['Samples'] = self._totals(self.cpu)
+        return result
+
+
+def stripped_ids(values) -> np.ndarray:
+    """VM ids with surrounding whitespace removed from the text ones, as prepare_vm_upload does"""
+    return np.array([value.strip() if isinstance(value, str) else value for value in values], dtype=object)
+
+
+def stream_utilization_csv(source, sketch: Optional[UtilizationSketch] = None,
+                           vm_column: str = METRIC_VM_COLUMN, cpu_column: str = METRIC_CPU_COLUMN,
+                           memory_column: str = METRIC_MEMORY_COLUMN,
+                           chunksize: int = DEFAULT_CHUNKSIZE) -> UtilizationSketch:
+    """Stream a long-format metric CSV (VM, timestamp, CPU %, memory %) into a sketch in chunks"""
+    if sketch is None:
+        sketch = UtilizationSketch()
+    chunks = pd.read_csv(source, usecols=[vm_column, cpu_column, memory_column],
+                         chunksize=chunksize, low_memory=True)
+    for chunk in chunks:
+        sketch.update(chunk[vm_column], chunk[cpu_column], chunk[memory_column])
+    return sketch
+
+
+def apply_percentile_usage(df: pd.DataFrame, usage, percentile: float = 95,
+                           vm_column: str = 'Instance Name or ID') -> pd.DataFrame:
+    """Replace 'Max CPU (%)'/'Max Memory (%)' with the sketched percentile where samples exist.
+
+    ``usage`` is a UtilizationSketch or its quantiles() table for ``percentile``
+    (the compact form to hand to worker processes). VMs without samples keep
+    their exported maximum.
+    """
+    label = f"P{percentile:g}"
+    if isinstance(usage, UtilizationSketch):
+        usage = usage.quantiles([percentile])
+    usage = usage.set_index(METRIC_VM_COLUMN)
+    # Ids are matched whitespace-stripped on both sides; each distinct id is stripped once
+    codes, uniques = pd.factorize(df[vm_column], use_na_sentinel=False)
+    vm_ids = pd.Series(stripped_ids(uniques)[codes], index=df.index)
+    cpu = vm_ids.map(usage[f"{label} CPU (%)"])
+    memory = vm_ids.map(usage[f"{label} Memory (%)"])
+
+    result = df.copy()
+    result['Max CPU (%)'] = cpu.where(cpu.notna(), df['Max CPU (%)'])
+    result['Max Memory (%)'] = memory.where(memory.notna(), df['Max Memory (%)'])
+    return result
@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import json
 import math
+import numbers
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -11,17 +13,15 @@ import warnings
 import plotly.graph_objects as go
 import plotly.express as px
 
+from catalog_cache import CompiledCatalog, clean_price_column, load_compiled_catalog
+from ingest_cache import read_excel_cached, upload_content_key
+from tag_analysis import build_tag_index, cached_tag_index
+from usage_metrics import apply_percentile_usage, stream_utilization_csv
+
 # Suppress openpyxl warnings
 warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
 
 
-# Page configuration
-st.set_page_config(
-    page_title="Azure VM Right-Sizing Tool",
-    page_icon="☁️",
-    layout="wide"
-)
-
 # HARDCODED EMAIL CONFIGURATION - UPDATE THESE VALUES
 EMAIL_CONFIG = {
     "sender_email": "sarath2k01@gmail.com",
@@ -49,29 +49,25 @@ def clean_dataframe_for_display(df: pd.DataFrame) -> pd.DataFrame:
     
     return df_clean
 
-def load_azure_pricing_data() -> pd.DataFrame:
+AZURE_PRICING_PATH = r"C:\Users\sarat\Desktop\FinOps\azure-data.json"
+
+def prepare_azure_pricing_data(azure_data: list) -> pd.DataFrame:
+    """Build the pricing catalog frame from the parsed azure-data.json records"""
+    df = pd.DataFrame(azure_data)
+    df['memoryInGB'] = df['memoryInMB'].astype(float)
+    df['numberOfCores'] = df['numberOfCores'].astype(int)
+    df['linuxPrice'] = clean_price_column(df['linuxPrice'])
+    df['windowsPrice'] = clean_price_column(df['windowsPrice'])
+    return df
+
+def load_azure_pricing_catalog(path: str = AZURE_PRICING_PATH) -> CompiledCatalog:
+    """Load the pricing catalog through the compiled, process-wide cache"""
+    return load_compiled_catalog(path, prepare_azure_pricing_data)
+
+def load_azure_pricing_data(path: str = AZURE_PRICING_PATH) -> pd.DataFrame:
     """Load Azure pricing data from the JSON file"""
     try:
-        with open(r"C:\Users\sarat\Desktop\FinOps\azure-data.json", 'r') as file:
-            azure_data = json.load(file)
-        
-        df = pd.DataFrame(azure_data)
-        df['memoryInGB'] = df['memoryInMB'].astype(float)
-        df['numberOfCores'] = df['numberOfCores'].astype(int)
-        
-        def clean_price(price_str):
-            if pd.isna(price_str) or price_str == '' or str(price_str).lower() in ['n/a', 'na', 'null', 'none']:
-                return None
-            try:
-                cleaned = str(price_str).replace(',', '').replace('$', '').replace(' ', '')
-                return float(cleaned)
-            except:
-                return None
-        
-        df['linuxPrice'] = df['linuxPrice'].apply(clean_price)
-        df['windowsPrice'] = df['windowsPrice'].apply(clean_price)
-        
-        return df
+        return load_azure_pricing_catalog(path).frame
     except Exception as e:
         st.error(f"Error loading Azure pricing data: {str(e)}")
         return pd.DataFrame()
@@ -87,9 +83,73 @@ def map_columns(df: pd.DataFrame) -> pd.DataFrame:
     
     return mapped_df
 
+# Ingest normalization of VM exports
+PERCENT_COLUMNS = ['Max CPU (%)', 'Max Memory (%)']
+NUMBER_COLUMNS = ['CPU Count', 'Total Memory']
+CATEGORY_COLUMNS = ['Cloud', 'o9 CCID', 'Server Type', 'Platform', 'Instance Type', 'o9 CENVID']
+DEDUP_KEY_COLUMNS = ['Instance Name or ID', 'Private IP Address', 'o9 CENVID']
+# Tag columns indexed for the data preview's tag filters
+VM_TAGS = ['o9 CCID', 'o9 CENVID']
+
+def parse_percent_column(values: pd.Series) -> pd.Series:
+    """Parse usage cells such as '45.5 %' or '1,200' to float; unparseable cells become NaN"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    text = (values.astype(str).str.strip('% ')
+            .str.replace(',', '', regex=False).str.replace('None', 'nan', regex=False))
+    return pd.to_numeric(text, errors='coerce').astype(float)
+
+def real_number_cells(values: pd.Series) -> np.ndarray:
+    """True for cells holding a real number; text (even '4') is not one"""
+    return np.fromiter((isinstance(value, numbers.Real) for value in values.to_numpy(dtype=object)),
+                       dtype=bool, count=len(values))
+
+def parse_number_column(values: pd.Series) -> pd.Series:
+    """Numeric dtype for a column whose present cells are all numbers; otherwise left
+    as-is, so text cells (numeric-looking or not) still surface as processing errors"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values
+    if (real_number_cells(values) | values.isna().to_numpy()).all():
+        return pd.to_numeric(values)
+    return values
+
+def strip_text_column(values: pd.Series) -> pd.Series:
+    """Strip surrounding whitespace from the text cells of a column"""
+    if values.dtype != object:
+        return values
+    return values.where(~values.map(lambda value: isinstance(value, str)), values.str.strip())
+
+def prepare_vm_upload(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize a raw VM export the same way for the app and the command line.
+    
+    Dedup keys are stripped once before drop_duplicates, percent and count columns are
+    parsed with vectorized string operations, and repeated labels are stored as category.
+    """
+    df = df.copy()
+    df.columns = df.columns.str.strip()
+    df = map_columns(df)
+    
+    for column in DEDUP_KEY_COLUMNS:
+        df[column] = strip_text_column(df[column])
+    df = df.drop_duplicates(subset=DEDUP_KEY_COLUMNS)
+    
+    for column in PERCENT_COLUMNS:
+        df[column] = parse_percent_column(df[column])
+    for column in NUMBER_COLUMNS:
+        if column in df.columns:
+            df[column] = parse_number_column(df[column])
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and df[column].dtype == object:
+            df[column] = df[column].astype('category')
+    return df
+
 def calculate_actual_usage(max_cpu_percent: float, max_mem_percent: float, 
                           current_vcpus: int, current_memory_gb: float) -> Tuple[float, float]:
-    """Calculate actual CPU cores and memory used based on percentages"""
+    """Calculate actual CPU cores and memory used based on percentages (scalars or arrays).
+    
+    The percentages are the exported maxima, or a p95/p99 from usage_metrics when
+    a utilization time series is supplied.
+    """
     actual_cpu_cores = (max_cpu_percent / 100) * current_vcpus
     actual_memory_gb = (max_mem_percent / 100) * current_memory_gb
     return actual_cpu_cores, actual_memory_gb
@@ -110,6 +170,12 @@ def get_standard_memory_sizes() -> List[int]:
     """Get standard memory sizes"""
     return [4, 8, 16, 32, 64, 128, 256, 512, 1024]
 
+def round_up_to_standard_sizes(values: np.ndarray, standard_sizes: List[int]) -> np.ndarray:
+    """Vectorized round UP to the next standard size, capped at the largest size"""
+    sizes = np.asarray(standard_sizes)
+    positions = np.searchsorted(sizes, values, side='left')
+    return sizes[np.minimum(positions, len(sizes) - 1)]
+
 def round_up_to_standard_cpu(projected_cpu: float) -> int:
     """Always round UP to next standard CPU size with 4 vCPU minimum"""
     standard_sizes = get_standard_cpu_sizes()
@@ -147,6 +213,11 @@ def determine_platform_pricing(platform: str) -> str:
     # Default to Linux if unclear
     return 'linuxPrice'
 
+def determine_platform_pricing_column(platforms: pd.Series) -> pd.Series:
+    """Map a whole Platform column to price columns, detecting each distinct platform once"""
+    price_columns = {platform: determine_platform_pricing(platform) for platform in platforms.unique()}
+    return platforms.map(price_columns)
+
 def get_current_instance_price_with_fallback(instance_type: str, platform: str, azure_df: pd.DataFrame) -> Optional[float]:
     """Get price with comprehensive fallback logic"""
     price_column = determine_platform_pricing(platform)
@@ -175,6 +246,121 @@ def get_current_instance_price_with_fallback(instance_type: str, platform: str,
     
     return None  # Only return None, not tuple
 
+def select_catalog_prices(azure_df: pd.DataFrame, catalog_positions: np.ndarray, price_columns: np.ndarray) -> np.ndarray:
+    """Read each catalog row's price from that row's own price column"""
+    prices = np.full(len(catalog_positions), np.nan)
+    for price_column in pd.unique(price_columns):
+        selected = price_columns == price_column
+        prices[selected] = azure_df[price_column].to_numpy(dtype=float)[catalog_positions[selected]]
+    return prices
+
+class PricingLookup:
+    """Current-instance pricing built once per catalog from load_azure_pricing_data.
+    
+    Holds a dict of SKU name to catalog row, the per-family average price of every catalog
+    family for each platform column, and the cheapest-SKU frontiers, so exact prices,
+    fallback prices and architecture cost O(1) per VM instead of scans of azure_df.
+    """
+    
+    def __init__(self, azure_df: pd.DataFrame):
+        self.azure_df = azure_df
+        names = azure_df['name']
+        first_rows = ~names.duplicated().to_numpy()
+        self.positions = dict(zip(names[first_rows], np.flatnonzero(first_rows)))
+        self.architectures = (
+            azure_df['cpuArchitecture'].to_numpy(dtype=object) if 'cpuArchitecture' in azure_df.columns else None
+        )
+        self.prices = {
+            price_column: azure_df[price_column].to_numpy(dtype=float)
+            for price_column in ['linuxPrice', 'windowsPrice']
+        }
+        
+        # Names sorted for prefix ranges: "Standard_<family>" matches a contiguous slice
+        text_positions = np.flatnonzero(names.map(lambda name: isinstance(name, str)).to_numpy(dtype=bool))
+        order = np.argsort(names.to_numpy(dtype=object)[text_positions], kind='stable')
+        self.sorted_names = names.to_numpy(dtype=object)[text_positions][order]
+        self.sorted_positions = text_positions[order]
+        
+        self.family_prices = {}
+        families = names.iloc[text_positions].str.split('_').str[1].dropna().unique()
+        for family in families:
+            for price_column in self.prices:
+                self.family_price(family, price_column)
+        
+        self.price_frontiers = build_price_frontiers(azure_df)
+    
+    def architecture(self, instance_type: str):
+        """CPU architecture of the SKU, 'x64' when it is not in the catalog"""
+        position = self.positions.get(instance_type)
+        if position is None or self.architectures is None:
+            return 'x64'
+        return self.architectures[position]
+    
+    def family_price(self, family: str, price_column: str) -> Optional[float]:
+        """Average price of every SKU whose name starts with Standard_<family>"""
+        key = (family, price_column)
+        if key not in self.family_prices:
+            prefix = f"Standard_{family}"
+            start = np.searchsorted(self.sorted_names, prefix, side='left')
+            stop = np.searchsorted(self.sorted_names, prefix + '\U0010ffff', side='left')
+            # Catalog order keeps the average bit-identical to the scan it replaces
+            prices = self.prices[price_column][np.sort(self.sorted_positions[start:stop])]
+            average = pd.Series(prices[~np.isnan(prices)]).mean()
+            self.family_prices[key] = None if pd.isna(average) else average
+        return self.family_prices[key]
+    
+    def price(self, instance_type: str, platform: str) -> Optional[float]:
+        """get_current_instance_price_with_fallback without scanning the catalog"""
+        price_column = determine_platform_pricing(platform)
+        
+        # Try exact match first
+        position = self.positions.get(instance_type)
+        if position is not None and not np.isnan(self.prices[price_column][position]):
+            return self.prices[price_column][position]
+        
+        # Fallback 1: Try similar instance family
+        if '_' in instance_type:
+            return self.family_price(instance_type.split('_')[1], price_column)
+        
+        return None
+    
+    def lookup_many(self, instance_types: pd.Series, platforms: pd.Series) -> pd.DataFrame:
+        """Catalog row, architecture, price column and price for whole columns of VMs
+        
+        'failed' marks non-text instance types without an exact price, which make the
+        scalar lookup raise.
+        """
+        price_columns = determine_platform_pricing_column(platforms).to_numpy(dtype=object)
+        instance_types = instance_types.astype(object)
+        catalog_positions = instance_types.map(self.positions).to_numpy(dtype=float)
+        known = ~np.isnan(catalog_positions)
+        known_positions = catalog_positions[known].astype(int)
+        
+        architectures = np.full(len(instance_types), 'x64', dtype=object)
+        if self.architectures is not None:
+            architectures[known] = self.architectures[known_positions]
+        
+        prices = np.full(len(instance_types), np.nan)
+        prices[known] = select_catalog_prices(self.azure_df, known_positions, price_columns[known])
+        
+        # Fallback 1: average price of the similar instance family
+        needs_fallback = np.isnan(prices)
+        is_text = instance_types.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+        
+        fallback_positions = np.flatnonzero(needs_fallback & is_text)
+        families = instance_types.iloc[fallback_positions].str.split('_').str[1].to_numpy(dtype=object)
+        fallback = pd.DataFrame({'family': families, 'price_column': price_columns[fallback_positions]})
+        for (family, price_column), group in fallback.dropna().groupby(['family', 'price_column'], sort=False):
+            average = self.family_price(family, price_column)
+            prices[fallback_positions[group.index]] = np.nan if average is None else average
+        
+        return pd.DataFrame({
+            'catalog_position': catalog_positions,
+            'architecture': architectures,
+            'price_column': price_columns,
+            'price': prices,
+            'failed': needs_fallback & ~is_text,
+        }, index=instance_types.index)
 
 def find_cost_effective_instance(cpu_req: int, memory_req: int, platform: str, 
                                current_architecture: str, current_price: Optional[float], 
@@ -211,217 +397,604 @@ def find_cost_effective_instance(cpu_req: int, memory_req: int, platform: str,
         'architecture': cheapest['cpuArchitecture']
     }
 
+class PriceFrontierIndex:
+    """Cheapest-SKU index over one (architecture, price column) slice of the catalog.
+    
+    Only the Pareto frontier of (cores, memory, price) is kept: a SKU is dropped when another
+    one with at least as many cores and as much memory costs less (or the same and comes
+    first in the catalog, matching idxmin). For every distinct core count the frontier is
+    sorted by memory with a suffix minimum of price, so a lookup is two binary searches.
+    """
+    
+    def __init__(self, azure_df: pd.DataFrame, architecture: str, price_column: str):
+        self.architecture = architecture
+        self.price_column = price_column
+        
+        cores = azure_df['numberOfCores'].to_numpy(dtype=float)
+        memory = azure_df['memoryInGB'].to_numpy(dtype=float)
+        prices = azure_df[price_column].to_numpy(dtype=float)
+        same_architecture = (azure_df['cpuArchitecture'] == architecture).to_numpy()
+        candidates = np.flatnonzero(same_architecture & ~np.isnan(prices) & ~np.isnan(cores) & ~np.isnan(memory))
+        # Cheapest first; the stable sort keeps catalog order among equal prices
+        candidates = candidates[np.argsort(prices[candidates], kind='stable')]
+        
+        self.core_levels = np.unique(cores[candidates])
+        level_of = np.searchsorted(self.core_levels, cores[candidates])
+        # Most memory seen so far among cheaper SKUs having at least each level's cores
+        most_memory = np.full(len(self.core_levels), -np.inf)
+        frontier = []
+        for rank, (position, level) in enumerate(zip(candidates, level_of)):
+            if most_memory[level] >= memory[position]:
+                continue
+            frontier.append(rank)
+            most_memory[:level + 1] = np.maximum(most_memory[:level + 1], memory[position])
+        frontier = np.asarray(frontier, dtype=int)
+        
+        self.frontier_positions = candidates[frontier]
+        self.prices = prices
+        self.memory_levels = []
+        self.best_positions = []
+        for level in self.core_levels:
+            ranks = frontier[cores[candidates[frontier]] >= level]
+            ranks = ranks[np.argsort(memory[candidates[ranks]], kind='stable')]
+            # Suffix minimum of price rank: best SKU among those with at least this much memory
+            best_ranks = np.minimum.accumulate(ranks[::-1])[::-1]
+            self.memory_levels.append(memory[candidates[ranks]])
+            self.best_positions.append(candidates[best_ranks])
+    
+    def cheapest(self, cpu_req: float, memory_req: float, below_price: Optional[float] = None) -> Optional[int]:
+        """Catalog position of the cheapest SKU with enough cores and memory (and cheaper than below_price)"""
+        level = np.searchsorted(self.core_levels, cpu_req, side='left')
+        if level == len(self.core_levels):
+            return None
+        slot = np.searchsorted(self.memory_levels[level], memory_req, side='left')
+        if slot == len(self.memory_levels[level]):
+            return None
+        position = int(self.best_positions[level][slot])
+        if below_price is not None and not self.prices[position] < below_price:
+            return None
+        return position
+    
+    def cheapest_many(self, cpu_reqs: np.ndarray, memory_reqs: np.ndarray) -> np.ndarray:
+        """Vectorized cheapest: catalog position per request, -1 where nothing is big enough"""
+        positions = np.full(len(cpu_reqs), -1)
+        levels = np.searchsorted(self.core_levels, cpu_reqs, side='left')
+        for level in np.unique(levels[levels < len(self.core_levels)]):
+            requests = np.flatnonzero(levels == level)
+            slots = np.searchsorted(self.memory_levels[level], memory_reqs[requests], side='left')
+            found = slots < len(self.memory_levels[level])
+            positions[requests[found]] = self.best_positions[level][slots[found]]
+        return positions
+
+def build_price_frontiers(azure_df: pd.DataFrame) -> Dict[Tuple[str, str], PriceFrontierIndex]:
+    """Build a PriceFrontierIndex for every (architecture, price column) in the catalog"""
+    if 'cpuArchitecture' not in azure_df.columns:
+        return {}
+    
+    return {
+        (architecture, price_column): PriceFrontierIndex(azure_df, architecture, price_column)
+        for architecture in azure_df['cpuArchitecture'].dropna().unique()
+        for price_column in ['linuxPrice', 'windowsPrice']
+    }
+
+def find_cost_effective_instances(cpu_reqs: np.ndarray, memory_reqs: np.ndarray, price_columns: np.ndarray,
+                                  architectures: np.ndarray, 
+                                  price_frontiers: Dict[Tuple[str, str], PriceFrontierIndex]) -> np.ndarray:
+    """Vectorized find_cost_effective_instance: catalog position of the cheapest suitable SKU, -1 if none
+    
+    The cheapest suitable SKU is also the cheapest one below any current price it beats, so
+    the current price never changes the pick and is not needed here.
+    """
+    positions = np.full(len(cpu_reqs), -1)
+    requests = pd.DataFrame({'price_column': price_columns, 'architecture': architectures})
+    for (price_column, architecture), group in requests.groupby(
+            ['price_column', 'architecture'], sort=False, dropna=True):
+        index = price_frontiers.get((architecture, price_column))
+        if index is not None:
+            rows = group.index.to_numpy()
+            positions[rows] = index.cheapest_many(cpu_reqs[rows], memory_reqs[rows])
+    
+    return positions
+
+CRITICAL_FIELDS = ['Max CPU (%)', 'Max Memory (%)', 'CPU Count', 'Total Memory', 'Instance Type', 'Platform']
+
 def check_missing_data(row) -> bool:
     """Check if critical data is missing for analysis"""
-    critical_fields = ['Max CPU (%)', 'Max Memory (%)', 'CPU Count', 'Total Memory', 'Instance Type', 'Platform']
-    
-    for field in critical_fields:
+    for field in CRITICAL_FIELDS:
         value = row.get(field)
         if pd.isna(value) or value is None or value == '' or value == 0:
             return True
     return False
 
+def find_missing_data(df: pd.DataFrame) -> np.ndarray:
+    """Vectorized check_missing_data: True for every row missing critical data"""
+    missing = np.zeros(len(df), dtype=bool)
+    
+    for field in CRITICAL_FIELDS:
+        if field not in df.columns:
+            return np.ones(len(df), dtype=bool)
+        values = df[field]
+        missing |= (values.isna() | (values == '') | (values == 0)).to_numpy(dtype=bool)
+    return missing
+
+def coerce_numeric_column(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Return a column as floats plus a mask of present values that are not numbers.
+    
+    Text cells count as invalid even when they look numeric ('4'): the per-row
+    engine did arithmetic on the raw cells, so text always ended as an error.
+    Use coerce_int_column where it only printed int() of the cell.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=float), np.zeros(len(values), dtype=bool)
+    
+    is_number = real_number_cells(values)
+    numeric = pd.to_numeric(values.where(is_number), errors='coerce')
+    invalid = values.notna().to_numpy(dtype=bool) & ~is_number
+    return numeric.to_numpy(dtype=float), invalid
+
+def coerce_int_column(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Return a column the way int() reads each cell, plus a mask of present cells it rejects.
+    
+    Integer text ('8', ' 8 ') is accepted as int() accepts it, while '8.0' and
+    non-numeric text are rejected. Each distinct cell is converted once.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        floats = values.to_numpy(dtype=float)
+        return np.trunc(floats), np.isinf(floats)
+    
+    codes, uniques = pd.factorize(values.to_numpy(dtype=object), use_na_sentinel=False)
+    parsed = np.full(len(uniques), np.nan)
+    rejected = np.zeros(len(uniques), dtype=bool)
+    for position, value in enumerate(uniques):
+        if pd.isna(value):
+            continue
+        try:
+            parsed[position] = int(value)
+        except (TypeError, ValueError, OverflowError):
+            rejected[position] = True
+    return parsed[codes], rejected[codes]
+
 def should_skip_high_usage(max_cpu_percent: float, max_memory_percent: float) -> bool:
     """Skip instances with CPU ≥80% OR Memory ≥80% as they're already well-utilized"""
     return max_cpu_percent >= 80.0 or max_memory_percent >= 80.0
 
-def create_analysis_table(df: pd.DataFrame, azure_df: pd.DataFrame) -> pd.DataFrame:
-    """Create analysis table with updated logic and proper data types"""
-    analysis_results = []
+ANALYSIS_COLUMNS = [
+    'Instance Name', 'Current vCPUs', 'Current Memory (GB)', 'Current CPU Usage (%)',
+    'Current Memory Usage (%)', 'Actual CPU Cores Used', 'Actual Memory Used (GB)',
+    'Projected CPU Cores (30% buffer)', 'Projected Memory (30% buffer)', 'Standard CPU Target',
+    'Standard Memory Target', 'CPU Architecture', 'Status'
+]
+
+RECOMMENDATION_COLUMNS = [
+    'CCID', 'Instance Name or ID', 'Current CPU Usage (%)', 'Current Memory Usage (%)',
+    'Instance Type(current)', 'Recommended Instance Type', 'Current Instance Price',
+    'Recommended Instance Price', 'Savings', 'CPU Architecture', 'Status'
+]
+
+# Outcome of right-sizing one VM, stored as a categorical 'Status' column
+STATUS_RECOMMENDED = 'Recommended'
+STATUS_SAVINGS_UNKNOWN = 'Current Price Unknown'
+STATUS_NO_SUITABLE = 'No Suitable Instance'
+STATUS_HIGH_USAGE = 'High Usage'
+STATUS_INSUFFICIENT_DATA = 'Insufficient Data'
+# Critical data present but unusable (e.g. text in a numeric column); counted as insufficient data
+STATUS_PROCESSING_ERROR = 'Processing Error'
+RECOMMENDATION_STATUSES = [
+    STATUS_RECOMMENDED, STATUS_SAVINGS_UNKNOWN, STATUS_NO_SUITABLE,
+    STATUS_HIGH_USAGE, STATUS_INSUFFICIENT_DATA, STATUS_PROCESSING_ERROR
+]
+
+USAGE_COLUMNS = ['Current CPU Usage (%)', 'Current Memory Usage (%)']
+PRICE_COLUMNS = ['Current Instance Price', 'Recommended Instance Price', 'Savings']
+
+def compute_vm_sizing(df: pd.DataFrame, buffer_percent: float = 30) -> pd.DataFrame:
+    """Shared per-VM intermediates: data checks, actual usage, buffered projection and standard targets"""
+    row_count = len(df)
+    missing = find_missing_data(df)
     
-    for _, row in df.iterrows():
-        try:
-            if check_missing_data(row):
-                analysis_results.append({
-                    'Instance Name': row.get('Instance Name or ID', 'N/A'),
-                    'Current vCPUs': 'N/A',
-                    'Current Memory (GB)': 'N/A',
-                    'Current CPU Usage (%)': 'N/A',
-                    'Current Memory Usage (%)': 'N/A',
-                    'Actual CPU Cores Used': 'N/A',
-                    'Actual Memory Used (GB)': 'N/A',
-                    'Projected CPU Cores (30% buffer)': 'N/A',
-                    'Projected Memory (30% buffer)': 'N/A',
-                    'Standard CPU Target': 'N/A',
-                    'Standard Memory Target': 'N/A',
-                    'CPU Architecture': 'N/A',
-                    'Status': 'Insufficient Data'
-                })
-                continue
-            
-            cpu_usage_pct = row['Max CPU (%)']
-            memory_usage_pct = row['Max Memory (%)']
-            
-            if should_skip_high_usage(cpu_usage_pct, memory_usage_pct):
-                analysis_results.append({
-                    'Instance Name': row.get('Instance Name or ID', 'N/A'),
-                    'Current vCPUs': str(int(row['CPU Count'])),
-                    'Current Memory (GB)': f"{row['Total Memory']:.1f}",
-                    'Current CPU Usage (%)': f"{cpu_usage_pct:.1f}%",
-                    'Current Memory Usage (%)': f"{memory_usage_pct:.1f}%",
-                    'Actual CPU Cores Used': 'N/A',
-                    'Actual Memory Used (GB)': 'N/A',
-                    'Projected CPU Cores (30% buffer)': 'N/A',
-                    'Projected Memory (30% buffer)': 'N/A',
-                    'Standard CPU Target': 'N/A',
-                    'Standard Memory Target': 'N/A',
-                    'CPU Architecture': 'N/A',
-                    'Status': 'High Usage (CPU≥80% OR Memory≥80%) - Skip'
-                })
-                continue
-            
-            current_vcpus = row['CPU Count']
-            current_memory = row['Total Memory']
-            
-            actual_cpu, actual_memory = calculate_actual_usage(
-                cpu_usage_pct, memory_usage_pct, current_vcpus, current_memory
-            )
-            
-            projected_cpu, projected_memory = calculate_projected_requirements(
-                actual_cpu, actual_memory, 30
-            )
-            
-            standard_cpu = round_up_to_standard_cpu(projected_cpu)
-            standard_memory = round_up_to_standard_memory(projected_memory)
-            
-            current_instance_data = azure_df[azure_df['name'] == row['Instance Type']]
-            current_architecture = 'N/A'
-            if not current_instance_data.empty:
-                current_architecture = current_instance_data.iloc[0].get('cpuArchitecture', 'N/A')
-            
-            analysis_results.append({
-                'Instance Name': row.get('Instance Name or ID', 'N/A'),
-                'Current vCPUs': str(int(current_vcpus)),
-                'Current Memory (GB)': f"{current_memory:.1f}",
-                'Current CPU Usage (%)': f"{cpu_usage_pct:.1f}%",
-                'Current Memory Usage (%)': f"{memory_usage_pct:.1f}%",
-                'Actual CPU Cores Used': f"{actual_cpu:.2f}",
-                'Actual Memory Used (GB)': f"{actual_memory:.1f}",
-                'Projected CPU Cores (30% buffer)': f"{projected_cpu:.2f}",
-                'Projected Memory (30% buffer)': f"{projected_memory:.1f}",
-                'Standard CPU Target': str(int(standard_cpu)),
-                'Standard Memory Target': f"{standard_memory} GB",
-                'CPU Architecture': current_architecture,
-                'Status': 'Ready for Analysis'
-            })
-            
-        except Exception as e:
-            analysis_results.append({
-                'Instance Name': row.get('Instance Name or ID', 'N/A'),
-                'Current vCPUs': 'Error',
-                'Current Memory (GB)': 'Error',
-                'Current CPU Usage (%)': 'Error',
-                'Current Memory Usage (%)': 'Error',
-                'Actual CPU Cores Used': 'Error',
-                'Actual Memory Used (GB)': 'Error',
-                'Projected CPU Cores (30% buffer)': 'Error',
-                'Projected Memory (30% buffer)': 'Error',
-                'Standard CPU Target': 'Error',
-                'Standard Memory Target': 'Error',
-                'CPU Architecture': 'Error',
-                'Status': f'Processing Error: {str(e)}'
-            })
-    
-    return pd.DataFrame(analysis_results)
-
-def process_vm_data(df: pd.DataFrame, azure_df: pd.DataFrame) -> pd.DataFrame:
-    """Process VM data with updated logic"""
-    results = []
-    
-    for _, row in df.iterrows():
-        try:
-            if check_missing_data(row):
-                results.append({
-                    'CCID': row.get('o9 CCID', 'N/A'),
-                    'Instance Name or ID': row.get('Instance Name or ID', 'N/A'),
-                    'Instance Type(current)': row.get('Instance Type', 'N/A'),
-                    'Recommended Instance Type': 'Insufficient Data',
-                    'Current Instance Price': 'N/A',
-                    'Recommended Instance Price': 'N/A',
-                    'Savings': 'N/A',
-                    'CPU Architecture': 'N/A',
-                })
-                continue
-            
-            if should_skip_high_usage(row['Max CPU (%)'], row['Max Memory (%)']):
-                results.append({
-                    'CCID': row.get('o9 CCID', 'N/A'),
-                    'Instance Name or ID': row.get('Instance Name or ID', 'N/A'),
-                    'Current CPU Usage (%)': f"{row['Max CPU (%)']:.1f}%",
-                    'Current Memory Usage (%)': f"{row['Max Memory (%)']:.1f}%",
-                    'Instance Type(current)': row['Instance Type'],
-                    'Recommended Instance Type': 'High Usage - No Right-sizing',
-                    'Current Instance Price': 'N/A',
-                    'Recommended Instance Price': 'N/A',
-                    'Savings': 'N/A',
-                    'CPU Architecture': 'N/A',
-                })
+    def numeric(column: str, coerce=coerce_numeric_column) -> Tuple[np.ndarray, np.ndarray]:
+        if missing.all():
+            return np.full(row_count, np.nan), np.zeros(row_count, dtype=bool)
+        return coerce(df[column])
+    
+    cpu_pct, cpu_invalid = numeric('Max CPU (%)')
+    mem_pct, mem_invalid = numeric('Max Memory (%)')
+    vcpus, vcpus_invalid = numeric('CPU Count')
+    memory_gb, memory_invalid = numeric('Total Memory')
+    # High-usage rows only had int() of the CPU Count printed, so integer text is fine there
+    vcpu_count, vcpu_count_invalid = numeric('CPU Count', coerce_int_column)
+    
+    invalid_usage = ~missing & (cpu_invalid | mem_invalid)
+    invalid_capacity = ~missing & (vcpus_invalid | memory_invalid)
+    invalid_listing = ~missing & (vcpu_count_invalid | memory_invalid)
+    with np.errstate(invalid='ignore'):
+        high_usage = ~missing & ~invalid_usage & ((cpu_pct >= 80.0) | (mem_pct >= 80.0))
+    ready = ~missing & ~invalid_usage & ~invalid_capacity & ~high_usage
+    
+    actual_cpu, actual_memory = calculate_actual_usage(cpu_pct, mem_pct, vcpus, memory_gb)
+    projected_cpu, projected_memory = calculate_projected_requirements(actual_cpu, actual_memory, buffer_percent)
+    
+    return pd.DataFrame({
+        'missing': missing,
+        'invalid_usage': invalid_usage,
+        'invalid_capacity': invalid_capacity,
+        'invalid_listing': invalid_listing,
+        'high_usage': high_usage,
+        'ready': ready,
+        'cpu_pct': cpu_pct,
+        'mem_pct': mem_pct,
+        'vcpus': vcpus,
+        'vcpu_count': vcpu_count,
+        'memory_gb': memory_gb,
+        'actual_cpu': actual_cpu,
+        'actual_memory': actual_memory,
+        'projected_cpu': projected_cpu,
+        'projected_memory': projected_memory,
+        'standard_cpu': round_up_to_standard_sizes(np.where(ready, projected_cpu, 0), get_standard_cpu_sizes()),
+        'standard_memory': round_up_to_standard_sizes(np.where(ready, projected_memory, 0), get_standard_memory_sizes()),
+    })
 
-                continue
-            
-            actual_cpu, actual_memory = calculate_actual_usage(
-                row['Max CPU (%)'], row['Max Memory (%)'], 
-                row['CPU Count'], row['Total Memory']
-            )
-            
-            projected_cpu, projected_memory = calculate_projected_requirements(
-                actual_cpu, actual_memory, 30
-            )
-            
-            standard_cpu = round_up_to_standard_cpu(projected_cpu)
-            standard_memory = round_up_to_standard_memory(projected_memory)
-            
-            current_instance_data = azure_df[azure_df['name'] == row['Instance Type']]
-            current_architecture = 'x64'
-            if not current_instance_data.empty:
-                current_architecture = current_instance_data.iloc[0].get('cpuArchitecture', 'x64')
-            
-            current_price = get_current_instance_price_with_fallback(
-                row['Instance Type'], row['Platform'], azure_df
-            )
-            
-            recommended = find_cost_effective_instance(
-                standard_cpu, standard_memory, row['Platform'], 
-                current_architecture, current_price, azure_df
+def lookup_ready_instances(rows: pd.DataFrame, sizing: pd.DataFrame, pricing: PricingLookup) -> pd.DataFrame:
+    """Current-instance lookup for the rows that reach right-sizing, indexed by row position"""
+    ready = sizing['ready'].to_numpy()
+    if not ready.any():
+        return pricing.lookup_many(pd.Series([], dtype=object), pd.Series([], dtype=object))
+    
+    ready_rows = rows[ready]
+    return pricing.lookup_many(ready_rows['Instance Type'], ready_rows['Platform'])
+
+def column_or_na(rows: pd.DataFrame, column: str) -> np.ndarray:
+    """Column values as objects, or 'N/A' everywhere when the upload lacks the column"""
+    if column in rows.columns:
+        return rows[column].to_numpy(dtype=object)
+    return np.full(len(rows), 'N/A', dtype=object)
+
+def format_selected(values: np.ndarray, template: str, selected: np.ndarray, fill: str = 'N/A') -> np.ndarray:
+    """template.format() of the selected values and fill elsewhere.
+    
+    Each distinct value is formatted once and rows share the resulting string,
+    so a column of a few hundred distinct usages costs a few hundred format
+    calls (and string objects) however many VMs it holds.
+    """
+    codes, uniques = pd.factorize(values[selected], use_na_sentinel=False)
+    labels = np.array([template.format(value) for value in uniques] + [fill], dtype=object)
+    positions = np.full(len(values), len(uniques), dtype=np.intp)
+    positions[selected] = codes
+    return labels[positions]
+
+def build_analysis_table(rows: pd.DataFrame, sizing: pd.DataFrame, current: pd.DataFrame,
+                         pricing: PricingLookup) -> pd.DataFrame:
+    """Hardware analysis table from the shared sizing columns"""
+    row_count = len(rows)
+    missing = sizing['missing'].to_numpy()
+    # Every listed row printed int() of its CPU Count; only ready rows did arithmetic on the capacities
+    high_usage = sizing['high_usage'].to_numpy()
+    error = (sizing['invalid_usage'] | sizing['invalid_listing']
+             | (sizing['invalid_capacity'] & ~sizing['high_usage'])).to_numpy()
+    high_usage = high_usage & ~error
+    ready = sizing['ready'].to_numpy() & ~error
+    shown = high_usage | ready
+    
+    def text(fill: str) -> np.ndarray:
+        values = np.full(row_count, fill, dtype=object)
+        values[error] = 'Error'
+        return values
+    
+    def formatted(column: str, template: str, selected: np.ndarray) -> np.ndarray:
+        values = format_selected(sizing[column].to_numpy(), template, selected)
+        values[error] = 'Error'
+        return values
+    
+    current_vcpus = np.where(high_usage, sizing['vcpu_count'].to_numpy(), sizing['vcpus'].to_numpy())
+    sizing = sizing.assign(current_vcpus=np.where(shown, current_vcpus, 0).astype(np.int64))
+    architecture = text('N/A')
+    ready_positions = current.index.to_numpy()
+    known = (~np.isnan(current['catalog_position'].to_numpy()) & (pricing.architectures is not None)
+             & ~error[ready_positions])
+    architecture[ready_positions[known]] = current['architecture'].to_numpy()[known]
+    
+    status = np.full(row_count, 'Insufficient Data', dtype=object)
+    status[error] = 'Processing Error: invalid numeric data'
+    status[high_usage] = 'High Usage (CPU≥80% OR Memory≥80%) - Skip'
+    status[ready] = 'Ready for Analysis'
+    
+    return pd.DataFrame({
+        'Instance Name': column_or_na(rows, 'Instance Name or ID'),
+        'Current vCPUs': formatted('current_vcpus', '{}', shown),
+        'Current Memory (GB)': formatted('memory_gb', '{:.1f}', shown),
+        'Current CPU Usage (%)': formatted('cpu_pct', '{:.1f}%', shown),
+        'Current Memory Usage (%)': formatted('mem_pct', '{:.1f}%', shown),
+        'Actual CPU Cores Used': formatted('actual_cpu', '{:.2f}', ready),
+        'Actual Memory Used (GB)': formatted('actual_memory', '{:.1f}', ready),
+        'Projected CPU Cores (30% buffer)': formatted('projected_cpu', '{:.2f}', ready),
+        'Projected Memory (30% buffer)': formatted('projected_memory', '{:.1f}', ready),
+        'Standard CPU Target': formatted('standard_cpu', '{}', ready),
+        'Standard Memory Target': formatted('standard_memory', '{} GB', ready),
+        'CPU Architecture': architecture,
+        'Status': status,
+    }, columns=ANALYSIS_COLUMNS)
+
+def build_recommendations_table(rows: pd.DataFrame, sizing: pd.DataFrame, current: pd.DataFrame,
+                                pricing: Optional[PricingLookup], azure_df: pd.DataFrame,
+                                catalog_positions: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """Recommendations table from the shared sizing columns and current-instance lookup
+    
+    catalog_positions, aligned with the rows of current, skips the cheapest-SKU
+    search when the caller has already run it (see sweep_buffer_percentages).
+    """
+    row_count = len(rows)
+    missing = sizing['missing'].to_numpy()
+    
+    # Capacity columns are only read once a VM gets past the high-usage skip
+    high_usage = sizing['high_usage'].to_numpy()
+    ready = sizing['ready'].to_numpy().copy()
+    error = (sizing['invalid_usage'] | (sizing['invalid_capacity'] & ~sizing['high_usage'])).to_numpy()
+    cpu_pct = sizing['cpu_pct'].to_numpy()
+    mem_pct = sizing['mem_pct'].to_numpy()
+    
+    current_architecture = np.full(row_count, 'N/A', dtype=object)
+    current_price = np.full(row_count, np.nan)
+    has_recommendation = np.zeros(row_count, dtype=bool)
+    recommended_name = np.full(row_count, 'No Suitable Instance', dtype=object)
+    recommended_price = np.full(row_count, np.nan)
+    recommended_architecture = np.full(row_count, None, dtype=object)
+    
+    if len(current) > 0:
+        ready_positions = current.index.to_numpy()
+        price_columns = current['price_column'].to_numpy()
+        architectures = current['architecture'].to_numpy()
+        failed = current['failed'].to_numpy().copy()
+        current_architecture[ready_positions] = architectures
+        current_price[ready_positions] = current['price'].to_numpy()
+        
+        if 'cpuArchitecture' not in azure_df.columns:
+            # Catalog without architecture data: find_cost_effective_instance fails for every VM
+            failed[:] = True
+        if catalog_positions is None:
+            catalog_positions = find_cost_effective_instances(
+                sizing['standard_cpu'].to_numpy()[ready_positions], sizing['standard_memory'].to_numpy()[ready_positions],
+                price_columns, architectures, pricing.price_frontiers
             )
-            
-            savings = None
-            savings_text = 'N/A'
-            if current_price is not None and recommended is not None:
-                savings = current_price - recommended['price']
-                savings_text = f"${savings:.2f}"
-            elif recommended is not None and current_price is None:
-                savings_text = "Cannot Calculate (Current Price Unknown)"
-            
-            results.append({
-                'CCID': row.get('o9 CCID', 'N/A'),
-                'Instance Name or ID': row.get('Instance Name or ID', 'N/A'),
-                'Current CPU Usage (%)': f"{row['Max CPU (%)']:.1f}%",
-                'Current Memory Usage (%)': f"{row['Max Memory (%)']:.1f}%",
-                'Instance Type(current)': row['Instance Type'],
-                'Recommended Instance Type': recommended['name'] if recommended else 'No Suitable Instance',
-                'Current Instance Price': f"${current_price:.2f}" if current_price is not None else 'N/A',
-                'Recommended Instance Price': f"${recommended['price']:.2f}" if recommended else 'N/A',
-                'Savings': savings_text,
-                'CPU Architecture': recommended['architecture'] if recommended else current_architecture,
-            })
-            
-        except Exception as e:
-            results.append({
-                    'CCID': row.get('o9 CCID', 'N/A'),
-                    'Instance Name or ID': row.get('Instance Name or ID', 'N/A'),
-                    'Current CPU Usage (%)': 'N/A',
-                    'Current Memory Usage (%)': 'N/A',
-                    'Instance Type(current)': row.get('Instance Type', 'N/A'),
-                    'Recommended Instance Type': 'Insufficient Data',
-                    'Current Instance Price': 'N/A',
-                    'Recommended Instance Price': 'N/A',
-                    'Savings': 'N/A',
-                    'CPU Architecture': 'N/A',
-            })
+        
+        found = (catalog_positions >= 0) & ~failed
+        found_positions = ready_positions[found]
+        has_recommendation[found_positions] = True
+        recommended_name[found_positions] = azure_df['name'].to_numpy(dtype=object)[catalog_positions[found]]
+        recommended_price[found_positions] = select_catalog_prices(azure_df, catalog_positions[found], price_columns[found])
+        if found.any():
+            recommended_architecture[found_positions] = azure_df['cpuArchitecture'].to_numpy(dtype=object)[catalog_positions[found]]
+        
+        error[ready_positions[failed]] = True
+        ready[ready_positions[failed]] = False
+    
+    # Assemble the table column by column; prices stay numeric until display
+    has_usage = high_usage | ready
+    cpu_usage = np.where(has_usage, cpu_pct, np.nan)
+    mem_usage = np.where(has_usage, mem_pct, np.nan)
+    
+    has_current_price = ready & ~np.isnan(current_price)
+    has_savings = has_recommendation & has_current_price
+    
+    recommended_type = np.full(row_count, 'Insufficient Data', dtype=object)
+    recommended_type[high_usage] = 'High Usage - No Right-sizing'
+    recommended_type[ready] = recommended_name[ready]
+    
+    status = np.full(row_count, STATUS_INSUFFICIENT_DATA, dtype=object)
+    status[error] = STATUS_PROCESSING_ERROR
+    status[high_usage] = STATUS_HIGH_USAGE
+    status[ready] = STATUS_NO_SUITABLE
+    status[has_recommendation] = STATUS_SAVINGS_UNKNOWN
+    status[has_savings] = STATUS_RECOMMENDED
+    
+    savings = np.full(row_count, np.nan)
+    savings[has_savings] = current_price[has_savings] - recommended_price[has_savings]
+    
+    architecture = np.full(row_count, 'N/A', dtype=object)
+    architecture[ready] = current_architecture[ready]
+    architecture[has_recommendation] = recommended_architecture[has_recommendation]
+    
+    results = pd.DataFrame({
+        'CCID': column_or_na(rows, 'o9 CCID'),
+        'Instance Name or ID': column_or_na(rows, 'Instance Name or ID'),
+        'Current CPU Usage (%)': cpu_usage,
+        'Current Memory Usage (%)': mem_usage,
+        'Instance Type(current)': column_or_na(rows, 'Instance Type'),
+        'Recommended Instance Type': recommended_type,
+        'Current Instance Price': np.where(has_current_price, current_price, np.nan),
+        'Recommended Instance Price': np.where(has_recommendation, recommended_price, np.nan),
+        'Savings': savings,
+        'CPU Architecture': architecture,
+        'Status': pd.Categorical(status, categories=RECOMMENDATION_STATUSES),
+    }, columns=RECOMMENDATION_COLUMNS)
+    
+    return order_recommendation_columns(results, missing)
+
+def order_recommendation_columns(results: pd.DataFrame, missing: np.ndarray) -> pd.DataFrame:
+    """Column layout of a recommendations table, which depends on its insufficient-data rows"""
+    # Insufficient-data rows carry no usage columns: with only those there are none,
+    # and a leading one pushes them to the end
+    if missing.all():
+        return results[[column for column in RECOMMENDATION_COLUMNS if column not in USAGE_COLUMNS]]
+    if missing[0]:
+        leading = [column for column in RECOMMENDATION_COLUMNS if column not in USAGE_COLUMNS]
+        return results[leading + USAGE_COLUMNS]
+    return results[RECOMMENDATION_COLUMNS]
+
+def summarize_recommendations(recommendations_df: pd.DataFrame) -> Dict:
+    """Summary counts and savings totals for a recommendations table"""
+    if recommendations_df.empty:
+        recommendations_df = pd.DataFrame({'Status': [], 'Savings': []})
+    status = recommendations_df['Status'].to_numpy(dtype=object)
+    counts = {name: int(np.count_nonzero(status == name)) for name in RECOMMENDATION_STATUSES}
+    savings = recommendations_df['Savings'].to_numpy(dtype=float)
+    positive_savings = savings[savings > 0]
+    
+    return {
+        'total': len(recommendations_df),
+        'successful': counts[STATUS_RECOMMENDED] + counts[STATUS_SAVINGS_UNKNOWN],
+        'high_usage': counts[STATUS_HIGH_USAGE],
+        'insufficient_data': counts[STATUS_INSUFFICIENT_DATA] + counts[STATUS_PROCESSING_ERROR],
+        'no_suitable': counts[STATUS_NO_SUITABLE],
+        'total_savings': float(positive_savings.sum()),
+        'avg_savings': float(positive_savings.mean()) if len(positive_savings) else 0,
+        'savings_count': len(positive_savings),
+    }
+
+def format_optional(values: pd.Series, template: str, fill: str = 'N/A') -> np.ndarray:
+    """Format the non-null values with a template, filling the rest"""
+    return format_selected(values.to_numpy(), template, values.notna().to_numpy(), fill)
 
+def format_recommendations(recommendations_df: pd.DataFrame) -> pd.DataFrame:
+    """Display copy of a recommendations table with usage and prices rendered as text"""
+    formatted = recommendations_df.copy()
+    # Usage was never read for insufficient-data rows (NaN, as before); processing errors show 'N/A'
+    insufficient = (recommendations_df['Status'] == STATUS_INSUFFICIENT_DATA).to_numpy()
+    for column in USAGE_COLUMNS:
+        if column in formatted.columns:
+            usage = format_optional(formatted[column], '{:.1f}%')
+            usage[insufficient] = np.nan
+            formatted[column] = usage
+    for column in PRICE_COLUMNS:
+        formatted[column] = format_optional(formatted[column], '${:.2f}')
     
-    return pd.DataFrame(results)
+    unknown = (recommendations_df['Status'] == STATUS_SAVINGS_UNKNOWN).to_numpy()
+    formatted.loc[unknown, 'Savings'] = "Cannot Calculate (Current Price Unknown)"
+    return formatted
+
+def recommendations_column_config() -> Dict:
+    """Streamlit column formats that keep the numeric recommendation columns sortable"""
+    config = {column: st.column_config.NumberColumn(format="%.1f%%") for column in USAGE_COLUMNS}
+    config.update({column: st.column_config.NumberColumn(format="$%.2f") for column in PRICE_COLUMNS})
+    return config
+
+def analyze_vm_data(df: pd.DataFrame, azure_df: pd.DataFrame, 
+                    pricing: Optional[PricingLookup] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Single analysis pass producing both the hardware analysis table and the recommendations table"""
+    if df.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    
+    rows = df.reset_index(drop=True)
+    sizing = compute_vm_sizing(rows)
+    if pricing is None:
+        pricing = PricingLookup(azure_df)
+    current = lookup_ready_instances(rows, sizing, pricing)
+    
+    return (
+        build_analysis_table(rows, sizing, current, pricing),
+        build_recommendations_table(rows, sizing, current, pricing, azure_df),
+    )
+
+def create_analysis_table(df: pd.DataFrame, azure_df: pd.DataFrame, 
+                          pricing: Optional[PricingLookup] = None) -> pd.DataFrame:
+    """Create analysis table with updated logic and proper data types"""
+    if df.empty:
+        return pd.DataFrame()
+    
+    rows = df.reset_index(drop=True)
+    sizing = compute_vm_sizing(rows)
+    if pricing is None:
+        pricing = PricingLookup(azure_df)
+    return build_analysis_table(rows, sizing, lookup_ready_instances(rows, sizing, pricing), pricing)
+
+def process_vm_data(df: pd.DataFrame, azure_df: pd.DataFrame, 
+                    pricing: Optional[PricingLookup] = None) -> pd.DataFrame:
+    """Process VM data with updated logic as whole-column operations over the fleet"""
+    if df.empty:
+        return pd.DataFrame()
+    
+    rows = df.reset_index(drop=True)
+    sizing = compute_vm_sizing(rows)
+    if pricing is None:
+        pricing = PricingLookup(azure_df)
+    current = lookup_ready_instances(rows, sizing, pricing)
+    return build_recommendations_table(rows, sizing, current, pricing, azure_df)
+
+
+DEFAULT_SWEEP_BUFFERS = [10, 20, 30, 40, 50]
+
+def sweep_buffer_percentages(df: pd.DataFrame, azure_df: pd.DataFrame, buffers: List[float] = DEFAULT_SWEEP_BUFFERS,
+                             pricing: Optional[PricingLookup] = None) -> Tuple[pd.DataFrame, Dict[float, pd.DataFrame]]:
+    """Recommendations at several buffer percentages from one broadcasted (VMs × buffers) sizing.
+    
+    Returns the savings-versus-buffer curve (one row per buffer with the
+    summary_stats fields) and the recommendations table for each buffer.
+    """
+    buffers = [float(buffer) for buffer in buffers]
+    if df.empty or not buffers:
+        return pd.DataFrame(), {}
+    
+    rows = df.reset_index(drop=True)
+    sizing = compute_vm_sizing(rows)
+    if pricing is None:
+        pricing = PricingLookup(azure_df)
+    current = lookup_ready_instances(rows, sizing, pricing)
+    ready_positions = current.index.to_numpy()
+    
+    # Projections and standard targets for every ready VM at every buffer: (VMs, buffers)
+    factors = 1 + np.asarray(buffers) / 100
+    projected_cpu = sizing['actual_cpu'].to_numpy()[ready_positions, None] * factors
+    projected_memory = sizing['actual_memory'].to_numpy()[ready_positions, None] * factors
+    standard_cpu = round_up_to_standard_sizes(projected_cpu.ravel(), get_standard_cpu_sizes()).reshape(projected_cpu.shape)
+    standard_memory = round_up_to_standard_sizes(projected_memory.ravel(), get_standard_memory_sizes()).reshape(projected_memory.shape)
+    
+    # One cheapest-SKU search over all (VM, buffer) pairs
+    buffer_count = len(buffers)
+    catalog_positions = find_cost_effective_instances(
+        standard_cpu.ravel(), standard_memory.ravel(),
+        np.repeat(current['price_column'].to_numpy(), buffer_count),
+        np.repeat(current['architecture'].to_numpy(), buffer_count),
+        pricing.price_frontiers
+    ).reshape(-1, buffer_count)
+    
+    tables = {}
+    curve = []
+    for i, buffer in enumerate(buffers):
+        buffer_columns = {}
+        for column, values in (('projected_cpu', projected_cpu), ('projected_memory', projected_memory),
+                               ('standard_cpu', standard_cpu), ('standard_memory', standard_memory)):
+            buffer_columns[column] = sizing[column].to_numpy().copy()
+            buffer_columns[column][ready_positions] = values[:, i]
+        buffer_sizing = sizing.assign(**buffer_columns)
+        tables[buffer] = build_recommendations_table(rows, buffer_sizing, current, pricing, azure_df,
+                                                     catalog_positions[:, i])
+        curve.append({'buffer_percent': buffer, **summarize_recommendations(tables[buffer])})
+    
+    return pd.DataFrame(curve), tables
+
+FLEET_SLICE_COLUMNS = ['o9 CCID', 'Server Type']
+
+def analyze_fleet(df: pd.DataFrame, azure_df: pd.DataFrame, 
+                  pricing: Optional[PricingLookup] = None) -> Dict[Tuple, Dict]:
+    """Right-size the whole upload in one pass and partition it by (CCID, Server Type).
+    
+    Returns {(ccid, server_type): {'analysis_df', 'recommendations_df', 'summary_stats'}}
+    in order of first appearance; each slice matches running analyze_vm_data on
+    just that CCID and Server Type. Rows missing either key belong to no slice.
+    """
+    if df.empty or any(column not in df.columns for column in FLEET_SLICE_COLUMNS):
+        return {}
+    
+    rows = df.reset_index(drop=True)
+    sizing = compute_vm_sizing(rows)
+    if pricing is None:
+        pricing = PricingLookup(azure_df)
+    current = lookup_ready_instances(rows, sizing, pricing)
+    analysis = build_analysis_table(rows, sizing, current, pricing)
+    recommendations = build_recommendations_table(rows, sizing, current, pricing, azure_df)[RECOMMENDATION_COLUMNS]
+    missing = sizing['missing'].to_numpy()
+    
+    groups = rows.groupby(FLEET_SLICE_COLUMNS, sort=False, observed=True).indices
+    fleet = {}
+    for key, positions in sorted(groups.items(), key=lambda group: group[1][0]):
+        slice_recommendations = order_recommendation_columns(
+            recommendations.iloc[positions].reset_index(drop=True), missing[positions]
+        )
+        fleet[key] = {
+            'analysis_df': analysis.iloc[positions].reset_index(drop=True),
+            'recommendations_df': slice_recommendations,
+            'summary_stats': summarize_recommendations(slice_recommendations),
+        }
+    return fleet
 
 
 def generate_html_report(analysis_df: pd.DataFrame, recommendations_df: pd.DataFrame, 
@@ -429,7 +1002,7 @@ def generate_html_report(analysis_df: pd.DataFrame, recommendations_df: pd.DataF
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     # Convert DataFrames to HTML
-    recommendations_html = recommendations_df.to_html(
+    recommendations_html = format_recommendations(recommendations_df).drop(columns='Status').to_html(
         index=False, 
         escape=False, 
         classes="recommendations-table",
@@ -785,6 +1358,13 @@ def send_email_smtp(html_content: str, ccid: str, server_type: str) -> Tuple[boo
 
 # Main Streamlit App
 def main():
+    # Page configuration
+    st.set_page_config(
+        page_title="Azure VM Right-Sizing Tool",
+        page_icon="☁️",
+        layout="wide"
+    )
+    
     st.title("☁️ Azure VM Right-Sizing Tool (Auto-Email Reports)")
     st.markdown("Upload your VM data and get recommendations with automatic email reporting.")
     
@@ -803,6 +1383,10 @@ def main():
         st.session_state.selected_server_type = None
     if 'filtered_df' not in st.session_state:
         st.session_state.filtered_df = None
+    if 'fleet_results' not in st.session_state:
+        st.session_state.fleet_results = None
+    if 'fleet_file_id' not in st.session_state:
+        st.session_state.fleet_file_id = None
     
     # Email configuration warning
     if "your.email@gmail.com" in EMAIL_CONFIG["sender_email"]:
@@ -826,12 +1410,19 @@ def main():
     - ✅ **Cost-effective only** - Only recommends cheaper instances
     """)
     
-    azure_df = load_azure_pricing_data()
+    try:
+        catalog = load_azure_pricing_catalog()
+    except Exception as e:
+        st.error(f"Error loading Azure pricing data: {str(e)}")
+        catalog = None
     
-    if azure_df.empty:
+    if catalog is None or catalog.frame.empty:
         st.error("Failed to load Azure pricing data. Please check the data file.")
         return
     
+    azure_df = catalog.frame
+    pricing = catalog.derive('pricing_lookup', PricingLookup)
+    
     with st.expander("🔍 Configuration Details"):
         st.write(f"**Minimum vCPUs:** {min(get_standard_cpu_sizes())}")
         st.write(f"**Standard CPU sizes:** {get_standard_cpu_sizes()}")
@@ -851,34 +1442,45 @@ def main():
     uploaded_file = st.file_uploader("Choose an Excel file", type=["xlsx"])
     
     if uploaded_file:
-        df = pd.read_excel(uploaded_file)
-        df.columns = df.columns.str.strip()
-        df = map_columns(df)
+        df = prepare_vm_upload(read_excel_cached(uploaded_file))
+        upload_df = df
+        tag_index = cached_tag_index(upload_content_key(uploaded_file), 'vms',
+                                     lambda: build_tag_index(upload_df, VM_TAGS))
         
-        df = df.drop_duplicates(subset=["Instance Name or ID", "Private IP Address", "o9 CENVID"])
+        # Optional per-sample utilization: size on a percentile instead of the single max
+        metrics_file = st.file_uploader(
+            "Optional: utilization metrics CSV (Instance Name or ID, Timestamp, CPU (%), Memory (%))",
+            type=["csv"]
+        )
+        sizing_percentile = None
+        if metrics_file:
+            sizing_percentile = st.radio("Size on utilization percentile", [95, 99], horizontal=True,
+                                         format_func=lambda percentile: f"p{percentile}")
+            if st.session_state.get('metrics_file_id') != metrics_file.file_id:
+                with st.spinner("Streaming utilization samples..."):
+                    st.session_state.usage_sketch = stream_utilization_csv(metrics_file)
+                st.session_state.metrics_file_id = metrics_file.file_id
+            sketch = st.session_state.usage_sketch
+            df = apply_percentile_usage(df, sketch, sizing_percentile)
+            st.info(f"📈 Using p{sizing_percentile} CPU/memory for {len(sketch)} VM(s) with utilization samples; "
+                    "other VMs keep their exported maximum.")
+        
+        # Results are reused only for the same upload and sizing inputs
+        analysis_key = (uploaded_file.file_id, metrics_file.file_id if metrics_file else None, sizing_percentile)
         
         ccid_options = df["o9 CCID"].dropna().unique().tolist()
         selected_ccid = st.selectbox("Filter by CCID", ccid_options)
-        df = df[df["o9 CCID"] == selected_ccid]
+        filtered_df = df[df["o9 CCID"] == selected_ccid]
         
-        server_type_options = df["Server Type"].dropna().unique().tolist()
+        server_type_options = filtered_df["Server Type"].dropna().unique().tolist()
         selected_server_type = st.selectbox("Filter by Server Type", server_type_options)
-        df = df[df["Server Type"] == selected_server_type]
-        
-        def safe_numeric(val):
-            try:
-                return float(str(val).strip('% ').replace(',', '').replace('None', 'nan'))
-            except:
-                return None
-        
-        df["Max CPU (%)"] = df["Max CPU (%)"].apply(safe_numeric)
-        df["Max Memory (%)"] = df["Max Memory (%)"].apply(safe_numeric)
+        filtered_df = filtered_df[filtered_df["Server Type"] == selected_server_type]
         
-        st.success(f"🎯 {df.shape[0]} unique VM(s) shown after applying all filters.")
+        st.success(f"🎯 {filtered_df.shape[0]} unique VM(s) shown after applying all filters.")
         
-        if not df.empty:
-            high_usage_count = len(df[(df["Max CPU (%)"] >= 80) | (df["Max Memory (%)"] >= 80)])
-            low_usage_count = len(df[(df["Max CPU (%)"] < 80) & (df["Max Memory (%)"] < 80)])
+        if not filtered_df.empty:
+            high_usage_count = len(filtered_df[(filtered_df["Max CPU (%)"] >= 80) | (filtered_df["Max Memory (%)"] >= 80)])
+            low_usage_count = len(filtered_df[(filtered_df["Max CPU (%)"] < 80) & (filtered_df["Max Memory (%)"] < 80)])
             
             col1, col2 = st.columns(2)
             with col1:
@@ -891,66 +1493,46 @@ def main():
             'Instance Type', 'Max CPU (%)', 'Max Memory (%)', 'CPU Count', 'Total Memory'
         ]
         
-        available_display_columns = [col for col in display_columns if col in df.columns]
+        available_display_columns = [col for col in display_columns if col in filtered_df.columns]
         
         st.write("### Data Preview")
+        # Tag filters are bitmask queries on the upload's tag index; they only narrow the preview
+        has_tags = st.multiselect("Has tags", tag_index.tags, key="vm_has_tags")
+        missing_tags = st.multiselect("Missing tags", tag_index.tags, key="vm_missing_tags")
+        preview_df = tag_index.select(filtered_df, has_tags, missing_tags)
         if available_display_columns:
-            st.dataframe(df[available_display_columns])
+            st.dataframe(preview_df[available_display_columns])
         else:
-            st.dataframe(df)
+            st.dataframe(preview_df)
         
-        # Analysis button - stores results in session state
+        # Analysis button - analyzes every CCID × Server Type once and stores the partitions
         if st.button("Run Enhanced Architecture-Aware Analysis"):
-            with st.spinner("Running enhanced analysis with architecture matching..."):
+            with st.spinner("Running enhanced analysis for every CCID and Server Type..."):
                 try:
-                    # Store filter values and data in session state
-                    st.session_state.selected_ccid = selected_ccid
-                    st.session_state.selected_server_type = selected_server_type
-                    st.session_state.filtered_df = df.copy()
-                    
-                    # Run analysis and store results in session state
-                    st.session_state.analysis_df = create_analysis_table(df, azure_df)
-                    st.session_state.recommendations_df = process_vm_data(df, azure_df)
-                    
-                    # Calculate summary stats
-                    insufficient_data_count = len(st.session_state.recommendations_df[st.session_state.recommendations_df['Recommended Instance Type'] == 'Insufficient Data'])
-                    high_usage_count = len(st.session_state.recommendations_df[st.session_state.recommendations_df['Recommended Instance Type'] == 'High Usage - No Right-sizing'])
-                    no_suitable_count = len(st.session_state.recommendations_df[st.session_state.recommendations_df['Recommended Instance Type'] == 'No Suitable Instance'])
-                    processing_error_count = len(st.session_state.recommendations_df[st.session_state.recommendations_df['Recommended Instance Type'] == 'Processing Error'])
-                    successful_analysis_count = len(st.session_state.recommendations_df) - insufficient_data_count - high_usage_count - no_suitable_count - processing_error_count
-                    
-                    # Calculate savings
-                    savings_values = []
-                    for savings_str in st.session_state.recommendations_df['Savings']:
-                        if savings_str != 'N/A' and 'Cannot Calculate' not in str(savings_str):
-                            try:
-                                savings_value = float(str(savings_str).replace('$', ''))
-                                if savings_value > 0:
-                                    savings_values.append(savings_value)
-                            except:
-                                continue
-                    
-                    total_savings = sum(savings_values) if savings_values else 0
-                    avg_savings = (sum(savings_values) / len(savings_values)) if savings_values else 0
-                    
-                    # Store summary stats in session state
-                    st.session_state.summary_stats = {
-                        'total': len(st.session_state.recommendations_df),
-                        'successful': successful_analysis_count,
-                        'high_usage': high_usage_count,
-                        'insufficient_data': insufficient_data_count,
-                        'no_suitable': no_suitable_count,
-                        'processing_error': processing_error_count,
-                        'total_savings': total_savings,
-                        'avg_savings': avg_savings,
-                        'savings_count': len(savings_values)
-                    }
-                    
-                    st.session_state.analysis_complete = True
+                    st.session_state.fleet_results = analyze_fleet(df, azure_df, pricing)
+                    st.session_state.fleet_file_id = analysis_key
                     st.rerun()  # Refresh to show results
                     
                 except Exception as e:
                     st.error(f"Error calculating recommendations: {str(e)}")
+        
+        # The filters only switch between precomputed slices
+        fleet_slice = None
+        if st.session_state.fleet_results is not None and st.session_state.fleet_file_id == analysis_key:
+            fleet_slice = st.session_state.fleet_results.get((selected_ccid, selected_server_type))
+            st.caption(f"Fleet analysis covers {len(st.session_state.fleet_results)} CCID × Server Type combination(s); "
+                       "changing the filters switches between the precomputed results.")
+        
+        st.session_state.selected_ccid = selected_ccid
+        st.session_state.selected_server_type = selected_server_type
+        st.session_state.filtered_df = filtered_df.copy()
+        if fleet_slice is not None:
+            st.session_state.analysis_df = fleet_slice['analysis_df']
+            st.session_state.recommendations_df = fleet_slice['recommendations_df']
+            st.session_state.summary_stats = fleet_slice['summary_stats']
+            st.session_state.analysis_complete = True
+        else:
+            st.session_state.analysis_complete = False
                     
     
     # Display results if analysis is complete
@@ -960,8 +1542,11 @@ def main():
         st.dataframe(analysis_df_clean, use_container_width=True)
         
         st.header("💡 Architecture-Aware Recommendations")
-        recommendations_df_clean = clean_dataframe_for_display(st.session_state.recommendations_df)
-        st.dataframe(recommendations_df_clean, use_container_width=True)
+        st.dataframe(
+            st.session_state.recommendations_df,
+            column_config=recommendations_column_config(),
+            use_container_width=True
+        )
         
         # Beautiful Summary Section with CSS styling
         summary_html = f"""
@@ -1016,6 +1601,30 @@ def main():
             """
             
             st.html(savings_html)         
+        
+        # Buffer sensitivity: one broadcasted sweep over the selected slice
+        with st.expander("📐 Buffer Sensitivity (savings vs. headroom)"):
+            sweep_buffers = st.multiselect("Buffer percentages", [0, 10, 20, 30, 40, 50, 75, 100],
+                                           default=DEFAULT_SWEEP_BUFFERS)
+            sweep_key = (st.session_state.fleet_file_id, st.session_state.selected_ccid,
+                         st.session_state.selected_server_type, tuple(sorted(sweep_buffers)))
+            if st.button("Run Buffer Sweep") and sweep_buffers:
+                with st.spinner("Sweeping buffer percentages..."):
+                    st.session_state.buffer_sweep = (sweep_key, sweep_buffer_percentages(
+                        st.session_state.filtered_df, azure_df, sorted(sweep_buffers), pricing))
+            
+            buffer_sweep = st.session_state.get('buffer_sweep')
+            if buffer_sweep is not None and buffer_sweep[0] == sweep_key and not buffer_sweep[1][0].empty:
+                curve, sweep_tables = buffer_sweep[1]
+                fig = px.line(curve, x='buffer_percent', y='total_savings', markers=True,
+                              labels={'buffer_percent': 'Buffer (%)', 'total_savings': 'Total Monthly Savings ($)'},
+                              title="Savings vs. Buffer Percentage")
+                st.plotly_chart(fig, use_container_width=True)
+                st.dataframe(curve, use_container_width=True)
+                
+                shown_buffer = st.selectbox("Recommendations at buffer (%)", list(sweep_tables))
+                st.dataframe(sweep_tables[shown_buffer], column_config=recommendations_column_config(),
+                             use_container_width=True)
     
         # Save Results to Dashboard functionality
         if st.session_state.get('analysis_complete', False):
@@ -0,0 +1,185 @@
+"""Headless VM right-sizing over Excel/CSV exports.
+
+    python vm_cli.py exports/*.xlsx --catalog azure-data.json --output-dir results [--cache-dir DIR]
+
+Writes <name>_recommendations.csv and <name>_summary.json per input file; inputs
+sharing a file name (a/fleet.xlsx, b/fleet.xlsx) are written as a_fleet, b_fleet.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import vm
+from ingest_cache import read_excel_cached
+from usage_metrics import apply_percentile_usage, stream_utilization_csv
+
+# Per-process state, set up once by init_worker
+_catalog_path: Optional[str] = None
+_usage = None
+_sizing_percentile: float = 95
+_cache_dir: Optional[str] = None
+
+
+def init_worker(catalog_path: str, usage: Optional[pd.DataFrame] = None, sizing_percentile: float = 95,
+                cache_dir: Optional[str] = None):
+    """Load the pricing catalog once per worker process"""
+    global _catalog_path, _usage, _sizing_percentile, _cache_dir
+    _catalog_path = catalog_path
+    _usage = usage
+    _sizing_percentile = sizing_percentile
+    _cache_dir = cache_dir
+    vm.load_azure_pricing_catalog(catalog_path)
+
+
+def read_vm_export(path: str, cache_dir: Optional[str] = None) -> pd.DataFrame:
+    """Read an Excel or CSV VM export; workbooks go through the ingest cache only when
+    a cache directory is given, so a batch run leaves no files behind by default"""
+    if path.lower().endswith('.csv'):
+        return pd.read_csv(path)
+    if cache_dir is None:
+        return pd.read_excel(path)
+    return read_excel_cached(path, cache_dir=cache_dir)
+
+
+def output_names(paths: List[str]) -> List[str]:
+    """Result file stem per input: its file name, prefixed with the parent directory when
+    several inputs share that name, and numbered if they still collide"""
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    stem_counts = Counter(stem.lower() for stem in stems)
+    names, taken = [], set()
+    for path, stem in zip(paths, stems):
+        if stem_counts[stem.lower()] > 1:
+            stem = f"{os.path.basename(os.path.dirname(os.path.abspath(path)))}_{stem}"
+        # Compared case-insensitively, as on Windows and macOS file systems
+        name, number = stem, 1
+        while name.lower() in taken:
+            number += 1
+            name = f"{stem}_{number}"
+        taken.add(name.lower())
+        names.append(name)
+    return names
+
+
+def analyze_file(path: str, output_dir: str, name: Optional[str] = None) -> Dict:
+    """Right-size one export and write its recommendations and summary stats (as <name>_*)"""
+    start = time.perf_counter()
+    catalog = vm.load_azure_pricing_catalog(_catalog_path)
+    pricing = catalog.derive('pricing_lookup', vm.PricingLookup)
+
+    df = vm.prepare_vm_upload(read_vm_export(path, _cache_dir))
+    if _usage is not None:
+        df = apply_percentile_usage(df, _usage, _sizing_percentile)
+    recommendations_df = vm.process_vm_data(df, catalog.frame, pricing)
+    summary_stats = vm.summarize_recommendations(recommendations_df)
+
+    if name is None:
+        name = os.path.splitext(os.path.basename(path))[0]
+    recommendations_path = os.path.join(output_dir, f"{name}_recommendations.csv")
+    summary_path = os.path.join(output_dir, f"{name}_summary.json")
+    recommendations_df.to_csv(recommendations_path, index=False)
+    with open(summary_path, 'w', encoding='utf-8') as file:
+        json.dump({'source': os.path.abspath(path), **summary_stats}, file, indent=2)
+
+    return {
+        'source': path,
+        'recommendations': recommendations_path,
+        'summary': summary_path,
+        'vms': len(recommendations_df),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def run(paths: List[str], catalog_path: str, output_dir: str, workers: int, usage: Optional[pd.DataFrame] = None,
+        sizing_percentile: float = 95, cache_dir: Optional[str] = None) -> Tuple[List[Dict], List[Tuple[str, str]]]:
+    """Analyze every file, fanning out across a process pool when workers > 1.
+
+    ``usage`` is the per-VM percentile table (UtilizationSketch.quantiles), which
+    is what each worker receives instead of the full histogram sketch.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results, failures = [], []
+    worker_args = (catalog_path, usage, sizing_percentile, cache_dir)
+    names = output_names(paths)
+
+    if workers <= 1:
+        init_worker(*worker_args)
+        for path, name in zip(paths, names):
+            try:
+                results.append(analyze_file(path, output_dir, name))
+                report(results[-1])
+            except Exception as e:
+                failures.append((path, str(e)))
+                print(f"FAILED {path}: {e}", file=sys.stderr)
+        return results, failures
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=worker_args) as pool:
+        futures = {pool.submit(analyze_file, path, output_dir, name): path for path, name in zip(paths, names)}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results.append(future.result())
+                report(results[-1])
+            except Exception as e:
+                failures.append((path, str(e)))
+                print(f"FAILED {path}: {e}", file=sys.stderr)
+    return results, failures
+
+
+def report(result: Dict):
+    print(f"{result['source']}: {result['vms']} VM(s) in {result['seconds']:.2f}s -> {result['recommendations']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Azure VM right-sizing without the Streamlit UI")
+    parser.add_argument('inputs', nargs='+', help="Excel (.xlsx) or CSV VM exports")
+    parser.add_argument('--catalog', default=vm.AZURE_PRICING_PATH, help="Path to azure-data.json")
+    parser.add_argument('--output-dir', default='vm_results', help="Directory for the result files")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: one per core)")
+    parser.add_argument('--metrics', action='append', default=[],
+                        help="Long-format utilization CSV (Instance Name or ID, Timestamp, CPU (%%), Memory (%%)); "
+                             "repeatable. VMs with samples are sized on --percentile instead of their max")
+    parser.add_argument('--percentile', type=float, default=95, help="Utilization percentile for --metrics (default: 95)")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Keep Parquet copies of parsed workbooks here and reuse them on later runs "
+                             "(default: no cache; workbooks are parsed every run)")
+    args = parser.parse_args(argv)
+
+    # Fail fast on a bad catalog instead of once per worker
+    try:
+        vm.load_azure_pricing_catalog(args.catalog)
+    except Exception as e:
+        print(f"Error loading Azure pricing data: {e}", file=sys.stderr)
+        return 2
+
+    usage = None
+    if args.metrics:
+        start = time.perf_counter()
+        usage_sketch = None
+        for metrics_path in args.metrics:
+            usage_sketch = stream_utilization_csv(metrics_path, usage_sketch)
+        # Workers only need each VM's percentile, not the histograms
+        usage = usage_sketch.quantiles([args.percentile])
+        print(f"Sketched utilization for {len(usage_sketch)} VM(s) in {time.perf_counter() - start:.1f}s")
+        del usage_sketch
+
+    workers = max(1, min(args.workers, len(args.inputs)))
+    start = time.perf_counter()
+    results, failures = run(args.inputs, args.catalog, args.output_dir, workers, usage, args.percentile,
+                              args.cache_dir)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(results)} file(s) analyzed, {len(failures)} failed, with {workers} worker(s) in {elapsed:.1f}s "
+          f"({len(results) / elapsed * 60:.1f} files/min)")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())